@@ -1,6 +1,17 @@
-import pandas as pd
-import chromadb
-from chromadb.utils import embedding_functions
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+
+from bm25_index import BM25_DIR, BM25Builder, BM25Index
+from embedder import EMBED_BATCH_SIZE, EMBED_WORKERS, EMBEDDING_BACKEND, make_embedder
+from embedding_cache import cached, get_embedding_cache
+from facet_index import FACET_DIR, FacetBuilder
+from identifier_index import IDENT_DIR, IdentifierBuilder
+from index_pointer import KEEP_VERSIONS, parse_name, parse_version, read_pointer, versioned_name, write_pointer
+from selection_cache import document_hash, get_selection_cache
 
 # -----------------------------
 # CONFIG
@@ -8,65 +19,399 @@ from chromadb.utils import embedding_functions
 EXCEL_PATH = "data/product_catalog.xlsx"
 CHROMA_DIR = "chroma_db"
 COLLECTION_NAME = "products_catalog"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 2000   # rows read (and embedded) at a time
+BATCH_SIZE = 500    # rows per collection.add call
+MANIFEST_PATH = "catalog_manifest.json"
 
-# -----------------------------
-# Embedding function
-# -----------------------------
-embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
 
-# -----------------------------
-# Persistent Chroma client
-# -----------------------------
-client = chromadb.PersistentClient(path=CHROMA_DIR)
+# =====================================================
+# STREAMING READERS
+# =====================================================
+# Each reader yields lists of row dicts (column name -> value), CHUNK_SIZE at
+# a time, without loading the whole file.
 
-# Recreate collection
-try:
-    client.delete_collection(COLLECTION_NAME)
-except Exception:
-    pass
+def _read_excel_chunks(path: str, chunk_size: int):
+    from openpyxl import load_workbook
 
-collection = client.create_collection(
-    name=COLLECTION_NAME,
-    embedding_function=embedding_function
-)
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h).strip() for h in next(rows)]
+        chunk = []
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            chunk.append(dict(zip(header, values)))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
 
-# -----------------------------
-# Load Excel
-# -----------------------------
-df = pd.read_excel(EXCEL_PATH, engine="openpyxl")
 
-documents = []
-ids = []
-metadatas = []
+def _read_csv_chunks(path: str, chunk_size: int):
+    import pandas as pd
+
+    for frame in pd.read_csv(path, chunksize=chunk_size):
+        yield frame.to_dict("records")
+
+
+def _read_parquet_chunks(path: str, chunk_size: int):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
 
-for _, row in df.iterrows():
+
+READERS = {
+    ".xlsx": _read_excel_chunks,
+    ".csv": _read_csv_chunks,
+    ".parquet": _read_parquet_chunks,
+}
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Unsupported catalog format: {ext} (expected one of {sorted(READERS)})")
+    return READERS[ext](path, chunk_size)
+
+
+# =====================================================
+# ROW -> DOCUMENT
+# =====================================================
+def _cell(value):
+    # blank cells arrive as None (openpyxl / parquet) or NaN (pandas)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+def render_row(row: dict):
+    """(id, document text, metadata) for one catalog row."""
     doc_text = f"""
-    Product Name: {row['Product_Name']}
-    Description: {row['Product_Description']}
-    Category: {row['Category']}
-    Sub Category: {row['Sub_Category']}
-    Brand: {row['Brand']}
-    Industry Use: {row['Industry_Use']}
-    Form Factor: {row['Form_Factor']}
-    Interface: {row['Interface_Type']}
+    Product Name: {_cell(row['Product_Name'])}
+    Description: {_cell(row['Product_Description'])}
+    Category: {_cell(row['Category'])}
+    Sub Category: {_cell(row['Sub_Category'])}
+    Brand: {_cell(row['Brand'])}
+    Industry Use: {_cell(row['Industry_Use'])}
+    Form Factor: {_cell(row['Form_Factor'])}
+    Interface: {_cell(row['Interface_Type'])}
+    """
+
+    metadata = {
+        "product_id": _cell(row["Product_ID"]),
+        "product_name": _cell(row["Product_Name"]),
+        "brand": _cell(row["Brand"]),
+        "category": _cell(row["Category"]),
+        "status": _cell(row["Lifecycle_Status"])
+    }
+    return str(row["Product_ID"]), doc_text.strip(), metadata
+
+
+def row_hash(doc_text: str, metadata: dict) -> str:
+    """Change detector for sync: rendered document plus metadata."""
+    return document_hash(doc_text + json.dumps(metadata, sort_keys=True, default=str))
+
+
+# =====================================================
+# MANIFEST (product id -> row hash of the last indexed version)
+# =====================================================
+def load_manifest(path: str = MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+# =====================================================
+# INGESTION
+# =====================================================
+def _cached(embedder):
+    # unchanged documents reuse their vectors from earlier runs
+    return cached(embedder, get_embedding_cache(embedder.cache_name))
+
+
+def _write(collection, embedder, ids, documents, metadatas, batch_size, upsert=False):
+    # one (parallel) embedding pass per chunk, written in bounded add()/upsert()
+    # batches with the precomputed vectors
+    write = collection.upsert if upsert else collection.add
+    embeddings = embedder(documents)
+    for i in range(0, len(ids), batch_size):
+        write(
+            ids=list(ids[i:i + batch_size]),
+            embeddings=list(embeddings[i:i + batch_size]),
+            documents=list(documents[i:i + batch_size]),
+            metadatas=list(metadatas[i:i + batch_size])
+        )
+
+
+def _report(total: int, start: float, label: str = "rows indexed"):
+    elapsed = time.perf_counter() - start
+    print(f"  {total} {label} ({total / elapsed if elapsed else 0:.0f} rows/sec)")
+
+
+def _collect_old_versions(client, active: int):
+    """
+    Drop versioned collections older than the KEEP_VERSIONS window, and all
+    but the newest KEEP_VERSIONS (version, revision) dirs of every index.
     """
+    for name in _collection_names(client):
+        version = parse_version(name, COLLECTION_NAME)
+        if version is not None and version <= active - KEEP_VERSIONS:
+            client.delete_collection(name)
+
+    names = os.listdir(".")
+    for prefix in (BM25_DIR, IDENT_DIR, FACET_DIR):
+        dirs = sorted((parsed, name) for name in names if (parsed := parse_name(name, prefix)))
+        for _, name in dirs[:-KEEP_VERSIONS]:
+            shutil.rmtree(name, ignore_errors=True)
+
+
+def _new_dir(path: str) -> str:
+    # leftover of an interrupted run: never published, so nobody reads it
+    shutil.rmtree(path, ignore_errors=True)
+    return path
+
+
+def _collection_names(client):
+    # chroma < 0.6 returns Collection objects, newer versions plain names
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def _report_cache(embedder):
+    cache = get_embedding_cache(embedder.cache_name)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Embedding cache: {stats['hits']} reused, {stats['misses']} embedded.")
 
-    documents.append(doc_text.strip())
-    ids.append(str(row["Product_ID"]))
-    metadatas.append({
-        "product_id": row["Product_ID"],
-        "product_name": row["Product_Name"],
-        "brand": row["Brand"],
-        "category": row["Category"],
-        "status": row["Lifecycle_Status"]
+
+def rebuild(path: str = EXCEL_PATH, chunk_size: int = CHUNK_SIZE, batch_size: int = BATCH_SIZE,
+            workers: int = EMBED_WORKERS, embed_batch_size: int = EMBED_BATCH_SIZE,
+            backend: str = EMBEDDING_BACKEND):
+    """
+    Full re-index into a new versioned collection and BM25 directory; the
+    active index pointer is only switched once both are complete, so
+    readers never see a missing or half-filled collection.
+    """
+    with make_embedder(backend, EMBEDDING_MODEL, workers, embed_batch_size) as embedder:
+        _rebuild(path, chunk_size, batch_size, embedder)
+
+
+def _rebuild(path, chunk_size, batch_size, embedder):
+    import chromadb
+
+    embed = _cached(embedder)
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+
+    active = read_pointer()
+    version = (active["version"] if active else 0) + 1
+    collection_name = versioned_name(COLLECTION_NAME, version)
+    bm25_dir = _new_dir(versioned_name(BM25_DIR, version))
+    ident_dir = _new_dir(versioned_name(IDENT_DIR, version))
+    facet_dir = _new_dir(versioned_name(FACET_DIR, version))
+
+    # leftover from an interrupted build of the same version
+    if collection_name in _collection_names(client):
+        client.delete_collection(collection_name)
+
+    # vectors are always computed here (see _write), Chroma never embeds
+    collection = client.create_collection(name=collection_name, embedding_function=None)
+    batch_size = min(batch_size, client.get_max_batch_size())
+
+    bm25_builder = BM25Builder()
+    ident_builder = IdentifierBuilder()
+    facet_builder = FacetBuilder()
+    doc_hashes = {}
+    manifest = {}
+    total = 0
+    start = time.perf_counter()
+
+    for chunk in read_chunks(path, chunk_size):
+        ids, documents, metadatas = zip(*(render_row(row) for row in chunk))
+        _write(collection, embed, ids, documents, metadatas, batch_size)
+
+        bm25_builder.add(ids, documents)
+        for doc_id, doc, meta in zip(ids, documents, metadatas):
+            ident_builder.add(doc_id, meta["product_id"], meta["product_name"])
+            facet_builder.add(doc_id, meta)
+            doc_hashes[str(meta["product_id"])] = document_hash(doc)
+            manifest[doc_id] = row_hash(doc, meta)
+
+        total += len(ids)
+        _report(total, start)
+
+    # -----------------------------
+    # Persist BM25 keyword, identifier and facet indexes, then switch readers over
+    # -----------------------------
+    bm25_builder.build().save(bm25_dir)
+    ident_builder.build().save(ident_dir)
+    facet_builder.build().save(facet_dir)
+    write_pointer({
+        "version": version,
+        "revision": 0,
+        "collection": collection_name,
+        "bm25_dir": bm25_dir,
+        "identifier_dir": ident_dir,
+        "facet_dir": facet_dir,
+        "embedding_model": EMBEDDING_MODEL,
     })
+    save_manifest(manifest)
+    _collect_old_versions(client, version)
+
+    # -----------------------------
+    # Drop cached selections for edited / removed products
+    # -----------------------------
+    selection_cache = get_selection_cache()
+    if selection_cache is not None:
+        stale = selection_cache.invalidate_changed(doc_hashes)
+        print(f"Invalidated {stale} cached selections.")
+
+    _report_cache(embedder)
+
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {total} products into {collection_name} in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.0f} rows/sec).")
+
+
+def sync(path: str = EXCEL_PATH, chunk_size: int = CHUNK_SIZE, batch_size: int = BATCH_SIZE,
+         workers: int = EMBED_WORKERS, embed_batch_size: int = EMBED_BATCH_SIZE,
+         backend: str = EMBEDDING_BACKEND):
+    """
+    Incremental re-index of the active version against the manifest: only
+    new or changed rows are embedded and upserted, rows missing from the
+    catalog are deleted. The delta is published as a new revision of the
+    active version; the collection stays queryable throughout. Falls back
+    to rebuild() when there is no manifest or active index yet.
+    """
+    with make_embedder(backend, EMBEDDING_MODEL, workers, embed_batch_size) as embedder:
+        _sync(path, chunk_size, batch_size, embedder)
+
+
+def _sync(path, chunk_size, batch_size, embedder):
+    import chromadb
+
+    manifest = load_manifest()
+    active = read_pointer()
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    embed = _cached(embedder)
+
+    collection = None
+    if active is not None and active.get("embedding_model") == EMBEDDING_MODEL:
+        try:
+            collection = client.get_collection(name=active["collection"], embedding_function=None)
+        except Exception:
+            collection = None
+
+    if manifest is None or collection is None or not os.path.exists(active["bm25_dir"]):
+        print("No compatible index to sync against; running a full rebuild.")
+        return _rebuild(path, chunk_size, batch_size, embedder)
+
+    batch_size = min(batch_size, client.get_max_batch_size())
+    seen = set()
+    changed_ids, changed_docs, changed_metas = [], [], []
+    # metadata only, cheap enough to rebuild in full on every sync
+    ident_builder = IdentifierBuilder()
+    facet_builder = FacetBuilder()
+    new_manifest = {}
+    total = 0
+    start = time.perf_counter()
+
+    for chunk in read_chunks(path, chunk_size):
+        rows = [render_row(row) for row in chunk]
+        for doc_id, doc, meta in rows:
+            seen.add(doc_id)
+            ident_builder.add(doc_id, meta["product_id"], meta["product_name"])
+            facet_builder.add(doc_id, meta)
+            new_manifest[doc_id] = row_hash(doc, meta)
+            if manifest.get(doc_id) != new_manifest[doc_id]:
+                changed_ids.append(doc_id)
+                changed_docs.append(doc)
+                changed_metas.append(meta)
+
+        total += len(rows)
+        _report(total, start, "rows checked")
+
+    removed = [doc_id for doc_id in manifest if doc_id not in seen]
+
+    # -----------------------------
+    # Apply the delta: new revision dirs, then Chroma, then one pointer switch
+    # -----------------------------
+    # Chroma has no revisions, so the live collection changes before the
+    # pointer does. Everything else is prepared first to keep that window
+    # to the Chroma writes themselves. Readers tolerate the skew: products
+    # BM25 does not know yet score 0 on keywords, and keyword / identifier
+    # hits already deleted from Chroma are dropped when their metadata is
+    # fetched (see HybridRetriever._gather).
+    if changed_ids or removed:
+        revision = active.get("revision", 0) + 1
+        bm25 = BM25Index.load(active["bm25_dir"], mmap=False).delete(removed)
+        if changed_ids:
+            bm25 = bm25.upsert(changed_ids, changed_docs)
+        bm25_dir = _new_dir(versioned_name(BM25_DIR, active["version"], revision))
+        bm25.save(bm25_dir)
+
+        ident_dir = _new_dir(versioned_name(IDENT_DIR, active["version"], revision))
+        ident_builder.build().save(ident_dir)
+        facet_dir = _new_dir(versioned_name(FACET_DIR, active["version"], revision))
+        facet_builder.build().save(facet_dir)
+
+        for i in range(0, len(changed_ids), chunk_size):
+            part = slice(i, i + chunk_size)
+            _write(collection, embed, changed_ids[part], changed_docs[part], changed_metas[part],
+                   batch_size, upsert=True)
+        for i in range(0, len(removed), batch_size):
+            collection.delete(ids=removed[i:i + batch_size])
+
+        # same version, new revision: running retrievers reload every index
+        write_pointer(dict(
+            active, bm25_dir=bm25_dir, identifier_dir=ident_dir, facet_dir=facet_dir,
+            revision=revision,
+        ))
+        _collect_old_versions(client, active["version"])
+
+        selection_cache = get_selection_cache()
+        if selection_cache is not None:
+            stale = selection_cache.invalidate_products(changed_ids + removed)
+            print(f"Invalidated {stale} cached selections.")
+
+    save_manifest(new_manifest)
+
+    _report_cache(embedder)
+
+    elapsed = time.perf_counter() - start
+    print(f"Synced {total} rows in {elapsed:.1f}s: "
+          f"{len(changed_ids)} new or changed, {len(removed)} removed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the product catalog into ChromaDB")
+    parser.add_argument("--input", default=EXCEL_PATH, help="catalog file: .xlsx, .csv or .parquet")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="embedding processes (sentence-transformers multi-process pool)")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=EMBEDDING_BACKEND,
+                        help="embedding backend (onnx: int8 model from export_onnx.py)")
+    parser.add_argument("--sync", action="store_true",
+                        help="incremental: only re-embed new/changed rows and delete removed ones")
+    args = parser.parse_args()
+
+    run = sync if args.sync else rebuild
+    run(args.input, args.chunk_size, args.batch_size, args.workers, args.embed_batch_size, args.backend)
 
-collection.add(
-    documents=documents,
-    ids=ids,
-    metadatas=metadatas
-)
 
-print(f"Indexed {len(ids)} products into ChromaDB.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Embedding throughput during ingestion: documents/sec for 1, 2, 4, ... worker
+processes, on rendered catalog documents (the same text add_data_to_db.py
+embeds).
+
+    python bench_embedding.py
+    python bench_embedding.py --docs 8000 --workers 1 2 4 8 --batch-size 128
+
+The catalog is repeated until --docs documents are available. Every run is
+checked against the single-process vectors.
+"""
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+from add_data_to_db import EXCEL_PATH, read_chunks, render_row
+from embedder import EMBED_BATCH_SIZE, EMBEDDING_MODEL, ParallelEmbedder
+
+
+def load_documents(path: str, n: int) -> list[str]:
+    docs = [render_row(row)[1] for chunk in read_chunks(path) for row in chunk]
+    return list(itertools.islice(itertools.cycle(docs), n))
+
+
+def default_workers() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=EXCEL_PATH)
+    parser.add_argument("--docs", type=int, default=4000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers())
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    documents = load_documents(args.input, args.docs)
+    print(f"model={EMBEDDING_MODEL} docs={len(documents)} batch_size={args.batch_size} "
+          f"cores={os.cpu_count()}")
+
+    reference = None
+    baseline = None
+    for workers in args.workers:
+        with ParallelEmbedder(EMBEDDING_MODEL, workers, args.batch_size) as embedder:
+            embedder(documents[:args.batch_size])  # warm-up: model load / pool start
+
+            start = time.perf_counter()
+            vectors = embedder(documents)
+            elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = vectors
+        assert np.allclose(vectors, reference, atol=1e-4), f"{workers} workers: vectors differ"
+
+        rate = len(documents) / elapsed
+        baseline = baseline or rate
+        print(f"  workers={workers:3d}  {rate:9.1f} docs/sec  speedup={rate / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
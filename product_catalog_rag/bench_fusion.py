@@ -0,0 +1,85 @@
+"""
+Microbenchmark: list-based hybrid fusion (the original hybrid_retrieve code)
+vs. the numpy path in fusion.py. Checks both produce the same ranking.
+
+    python bench_fusion.py [n_candidates] [repeats]
+"""
+import random
+import sys
+import timeit
+
+import numpy as np
+
+from fusion import fuse, top_k_indices
+
+TOP_K = 10
+
+
+def legacy_rank(candidates, top_k):
+    vec_scores = [1 - c["distance"] for c in candidates]
+    bm25_scores = [c["bm25"] for c in candidates]
+
+    def norm(xs):
+        if not xs or max(xs) == min(xs):
+            return xs
+        return [(x - min(xs)) / (max(xs) - min(xs)) for x in xs]
+
+    n_vec = norm(vec_scores)
+    n_bm25 = norm(bm25_scores)
+
+    for c, v, b in zip(candidates, n_vec, n_bm25):
+        c["hybrid_score"] = 0.5 * v + 0.3 * b + 0.2 * c["numeric_match"]
+
+    return sorted(candidates, key=lambda x: x["hybrid_score"], reverse=True)[:top_k]
+
+
+def numpy_rank(distance, bm25, numeric, top_k):
+    return top_k_indices(fuse(distance, bm25, numeric), top_k)
+
+
+def make_candidates(n):
+    return [
+        {
+            "product_id": f"P{i}",
+            "distance": random.choice([1.0, random.uniform(0.2, 0.9)]),
+            "bm25": random.choice([0.0, random.uniform(0, 12)]),
+            "numeric_match": random.choice([0, 0, 1]),
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    random.seed(0)
+
+    # ---- Ranking parity ----
+    for _ in range(200):
+        cands = make_candidates(n)
+        expected = [c["product_id"] for c in legacy_rank(cands, TOP_K)]
+        top = numpy_rank(
+            np.array([c["distance"] for c in cands]),
+            np.array([c["bm25"] for c in cands]),
+            np.array([c["numeric_match"] for c in cands]),
+            TOP_K,
+        )
+        assert [cands[i]["product_id"] for i in top] == expected
+
+    # ---- Timing ----
+    cands = make_candidates(n)
+    distance = np.array([c["distance"] for c in cands])
+    bm25 = np.array([c["bm25"] for c in cands])
+    numeric = np.array([c["numeric_match"] for c in cands])
+
+    t_legacy = timeit.timeit(lambda: legacy_rank(cands, TOP_K), number=repeats)
+    t_numpy = timeit.timeit(lambda: numpy_rank(distance, bm25, numeric, TOP_K), number=repeats)
+
+    print(f"candidates={n} repeats={repeats}")
+    print(f"  legacy lists : {t_legacy / repeats * 1e6:9.1f} us/query")
+    print(f"  numpy fusion : {t_numpy / repeats * 1e6:9.1f} us/query")
+    print(f"  speedup      : {t_legacy / t_numpy:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
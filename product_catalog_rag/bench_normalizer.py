@@ -0,0 +1,98 @@
+"""
+Benchmark the rule-based Stage 0 normalizer against the LLM on a fixture
+set (data/normalizer_fixtures.jsonl: raw input + expected item lines).
+
+    python bench_normalizer.py          # local normalizer vs. expected lines
+    LLM_CACHE=0 python bench_normalizer.py --llm    # also time the LLM, uncached
+
+Vocabulary comes from the BM25 index of the active index version (see
+index_pointer.py), so a catalog must have been ingested first. It is never
+taken from the expected outputs, which would make the score circular.
+"""
+import argparse
+import json
+import os
+import time
+
+from bm25_index import BM25_DIR, BM25Index
+from index_pointer import read_pointer, versioned_name
+from normalizer import MIN_CONFIDENCE, RuleBasedNormalizer
+
+FIXTURES = "data/normalizer_fixtures.jsonl"
+
+
+def load_fixtures(path: str = FIXTURES) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def agreement(a: list[str], b: list[str]) -> float:
+    """Jaccard overlap of the two item lists (case-insensitive)."""
+    sa = {x.lower() for x in a}
+    sb = {x.lower() for x in b}
+    return len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+
+
+def active_bm25_dir() -> str:
+    record = read_pointer()
+    if record is None:
+        return BM25_DIR
+    # the same resolution HybridRetriever uses for pointers without bm25_dir
+    return record.get("bm25_dir") or versioned_name(BM25_DIR, record["version"])
+
+
+def make_normalizer() -> RuleBasedNormalizer:
+    bm25_dir = active_bm25_dir()
+    if not os.path.exists(os.path.join(bm25_dir, "meta.json")):
+        raise SystemExit(f"No BM25 index in {bm25_dir}/; run `python cli.py ingest` first")
+
+    print(f"Vocabulary: BM25 index in {bm25_dir}/")
+    return RuleBasedNormalizer.from_bm25(BM25Index.load(bm25_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="also run the LLM normalizer")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    normalizer = make_normalizer()
+
+    # ---- Local normalizer ----
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        local = [normalizer.normalize(fx["input"]) for fx in fixtures]
+    local_ms = (time.perf_counter() - start) / (args.repeats * len(fixtures)) * 1000
+
+    exact = sum(queries == fx["expected"] for (queries, _), fx in zip(local, fixtures))
+    mean_agree = sum(agreement(q, fx["expected"]) for (q, _), fx in zip(local, fixtures)) / len(fixtures)
+    confident = sum(conf >= MIN_CONFIDENCE for _, conf in local)
+
+    print(f"fixtures={len(fixtures)}")
+    print(f"  local: {local_ms:8.3f} ms/input  exact={exact}/{len(fixtures)}  "
+          f"agreement={mean_agree:.3f}  confident={confident}/{len(fixtures)}")
+
+    for (queries, conf), fx in zip(local, fixtures):
+        if queries != fx["expected"]:
+            print(f"    mismatch (confidence {conf:.2f}): {queries} != {fx['expected']}")
+
+    # ---- LLM normalizer ----
+    if args.llm:
+        from logic import normalize_input
+        from utils import get_llm
+
+        llm = get_llm()
+        start = time.perf_counter()
+        remote = [normalize_input(fx["input"], llm, mode="llm") for fx in fixtures]
+        llm_ms = (time.perf_counter() - start) / len(fixtures) * 1000
+
+        vs_expected = sum(agreement(q, fx["expected"]) for q, fx in zip(remote, fixtures)) / len(fixtures)
+        vs_local = sum(agreement(q, l) for q, (l, _) in zip(remote, local)) / len(fixtures)
+        print(f"  llm  : {llm_ms:8.1f} ms/input  agreement with expected={vs_expected:.3f}  "
+              f"with local={vs_local:.3f}")
+        print(f"  speedup: {llm_ms / local_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+ONNX Runtime (int8 / fp32) vs. PyTorch sentence-transformers embedder:
+recall parity on the catalog and CPU latency.
+
+    python export_onnx.py      # once
+    python bench_onnx.py
+    python bench_onnx.py --fp32 --docs 2000 --k 10
+
+Parity: cosine between backend vectors per document, and recall@k
+overlap of the nearest catalog documents for a query set (fixture item
+lines plus product names), with the PyTorch ranking as reference. Both
+"onnx queries vs. torch index" (switching only the query side) and
+"onnx queries vs. onnx index" are reported.
+
+Latency: model load (including imports), single-query p50/p95, and
+batch throughput.
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from add_data_to_db import EXCEL_PATH, read_chunks, render_row
+from bench_normalizer import load_fixtures
+from embedder import EMBEDDING_MODEL, OnnxEmbedder, ParallelEmbedder
+
+
+def load_catalog(path: str, n: int):
+    rows = [render_row(row) for chunk in read_chunks(path) for row in chunk]
+    rows = rows[:n]
+    documents = [doc for _, doc, _ in rows]
+    queries = [line for fx in load_fixtures() for line in fx["expected"]]
+    queries += [str(meta["product_name"]) for _, _, meta in rows[:100]]
+    return documents, queries
+
+
+def top_k(queries: np.ndarray, documents: np.ndarray, k: int) -> np.ndarray:
+    sims = queries @ documents.T
+    return np.argsort(-sims, axis=1, kind="stable")[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, other: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(reference, other)]))
+
+
+def timed_load(factory):
+    start = time.perf_counter()
+    embedder = factory()
+    embedder(["warm up"])
+    return embedder, time.perf_counter() - start
+
+
+def latency(embedder, queries, repeats: int):
+    samples = []
+    for query in itertools.islice(itertools.cycle(queries), repeats):
+        start = time.perf_counter()
+        embedder([query])
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 95)
+
+
+def throughput(embedder, documents) -> float:
+    start = time.perf_counter()
+    embedder(documents)
+    return len(documents) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=EXCEL_PATH)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--fp32", action="store_true", help="use model.onnx instead of model.int8.onnx")
+    args = parser.parse_args()
+
+    documents, queries = load_catalog(args.input, args.docs)
+    print(f"model={EMBEDDING_MODEL} docs={len(documents)} queries={len(queries)} k={args.k}")
+
+    # ONNX first so its load time does not benefit from torch already being imported
+    onnx, onnx_load = timed_load(lambda: OnnxEmbedder(quantized=not args.fp32))
+    torch, torch_load = timed_load(lambda: ParallelEmbedder(EMBEDDING_MODEL, workers=1))
+
+    # ---- Parity ----
+    ref_docs, ref_queries = torch(documents), torch(queries)
+    onnx_docs, onnx_queries = onnx(documents), onnx(queries)
+
+    cosine = np.sum(ref_docs * onnx_docs, axis=1) / (
+        np.linalg.norm(ref_docs, axis=1) * np.linalg.norm(onnx_docs, axis=1)
+    )
+    reference = top_k(ref_queries, ref_docs, args.k)
+    mixed = recall_at_k(reference, top_k(onnx_queries, ref_docs, args.k))
+    full = recall_at_k(reference, top_k(onnx_queries, onnx_docs, args.k))
+
+    print(f"\nparity ({onnx.cache_name} vs torch)")
+    print(f"  cosine           mean={cosine.mean():.5f}  min={cosine.min():.5f}")
+    print(f"  recall@{args.k:<2d} onnx queries / torch index : {mixed:.4f}")
+    print(f"  recall@{args.k:<2d} onnx queries / onnx index  : {full:.4f}")
+
+    # ---- Latency ----
+    print("\nlatency")
+    for name, embedder, load in (("torch", torch, torch_load), (onnx.cache_name, onnx, onnx_load)):
+        p50, p95 = latency(embedder, queries, args.repeats)
+        rate = throughput(embedder, documents)
+        print(f"  {name:28s} load={load:6.2f}s  query p50={p50:6.2f}ms p95={p95:6.2f}ms  "
+              f"batch={rate:8.1f} docs/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+End-to-end latency of match_async (normalize, then retrieve, then select)
+vs. match_pipelined (the three stages overlapped) on a synthetic order.
+
+    python bench_pipeline.py [--items 200] [--retrieval-ms 20] [--llm-ms 300]
+
+Retrieval is a stand-in costing a fixed 50 ms per batch plus
+--retrieval-ms per query; the LLM is llm_stub behind a delay of --llm-ms
+per call, streamed in small chunks. No catalog or API key is needed, so
+only the scheduling is measured.
+"""
+import argparse
+import asyncio
+import time
+
+from llm_client import AsyncLLMClient, StubBackend
+from logic import TOP_K, match_async, match_pipelined
+
+STREAM_CHUNK = 40
+
+
+class SlowRetriever:
+    normalizer = None
+
+    def __init__(self, per_query: float):
+        self.per_query = per_query
+
+    def hybrid_retrieve_batch(self, queries, top_k, filters=None):
+        time.sleep(0.05 + self.per_query * len(queries))
+        return [
+            [{
+                "product_id": f"P{abs(hash(query)) % 10_000:04d}", "product_name": query, "category": "Widget",
+                "distance": 0.1, "hybrid_score": 1.0, "numeric_match": 0, "exact_identifier": False,
+                "doc": f"Name: {query}\nCategory: Widget",
+            }]
+            for query in queries
+        ]
+
+
+class SlowStub(StubBackend):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def complete(self, prompt: str) -> str:
+        await asyncio.sleep(self.delay)
+        return await super().complete(prompt)
+
+    async def stream(self, prompt: str):
+        # first chunk after the request latency, the rest as tokens are generated
+        await asyncio.sleep(self.delay)
+        text = await super().complete(prompt)
+        for i in range(0, len(text), STREAM_CHUNK):
+            await asyncio.sleep(0.002)
+            yield text[i:i + STREAM_CHUNK]
+
+
+async def measure(match_fn, text: str, retriever, delay: float) -> tuple:
+    first = []
+    start = time.perf_counter()
+    options = {"on_result": lambda i, record: first.append(time.perf_counter() - start)} \
+        if match_fn is match_pipelined else {}
+    results = await match_fn(text, retriever, AsyncLLMClient(SlowStub(delay), cache=None), TOP_K,
+                             normalizer_mode="llm", **options)
+    total = time.perf_counter() - start
+    return len(results), total, min(first) if first else total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--retrieval-ms", type=float, default=20)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    text = "\n".join(f"{i + 1}. widget model WX-{i:04d} x2" for i in range(args.items))
+    retriever = SlowRetriever(args.retrieval_ms / 1000)
+
+    print(f"{args.items} items\n")
+    print(f"  {'mode':18s} {'records':>8s} {'total':>8s} {'first record':>13s}")
+    for match_fn in (match_async, match_pipelined):
+        count, total, first = asyncio.run(measure(match_fn, text, retriever, args.llm_ms / 1000))
+        print(f"  {match_fn.__name__:18s} {count:8d} {total:7.2f}s {first:12.2f}s")
+
+
+if __name__ == "__main__":
+    main()
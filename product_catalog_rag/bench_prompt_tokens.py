@@ -0,0 +1,81 @@
+"""
+Selection-prompt size on the normalizer fixtures: the original verbose
+candidate blocks vs. the compact table, with and without score-gap
+candidate pruning.
+
+    python bench_prompt_tokens.py                          # retrieves with the active index
+    python bench_prompt_tokens.py --save batch_data.json   # ... and keeps the retrieved candidates
+    python bench_prompt_tokens.py --batch-data batch_data.json
+
+Token counts are prompt_planner.estimate_tokens (characters / 3.5), the
+same estimate the shard planner uses. One prompt per fixture, as Stage 2
+sends it before sharding.
+"""
+import argparse
+import json
+
+from bench_normalizer import load_fixtures
+from logic import TOP_K
+from prompt_builder import build_llm_prompt_batch
+from prompt_planner import estimate_tokens, pruned
+
+VARIANTS = (
+    ("verbose", "verbose", False),
+    ("verbose + pruning", "verbose", True),
+    ("compact", "compact", False),
+    ("compact + pruning", "compact", True),
+)
+
+
+def retrieve_fixture_batches(top_k: int) -> list[list[dict]]:
+    """batch_data for the expected item lines of every fixture."""
+    from logic import retrieve_candidates
+    from retrieval import HybridRetriever
+
+    retriever = HybridRetriever(debug=False)
+    return [retrieve_candidates(fx["expected"], retriever, top_k) for fx in load_fixtures()]
+
+
+def measure(batches: list[list[dict]]) -> dict:
+    report = {}
+    for label, prompt_format, prune in VARIANTS:
+        tokens, candidates = 0, 0
+        for batch_data in batches:
+            if prune:
+                batch_data = pruned(batch_data)
+            tokens += estimate_tokens(build_llm_prompt_batch(batch_data, prompt_format))
+            candidates += sum(len(item["candidates"]) for item in batch_data)
+        report[label] = (tokens, candidates)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-data", help="JSON list of batch_data lists instead of retrieving")
+    parser.add_argument("--save", help="write the retrieved batch_data lists here")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    if args.batch_data:
+        with open(args.batch_data, encoding="utf-8") as f:
+            batches = json.load(f)
+    else:
+        batches = retrieve_fixture_batches(args.top_k)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(batches, f, indent=2)
+
+    queries = sum(len(batch_data) for batch_data in batches)
+    print(f"{len(batches)} prompts, {queries} queries\n")
+
+    report = measure(batches)
+    baseline = report["verbose"][0]
+    print(f"  {'format':20s} {'tokens':>8s} {'per query':>10s} {'candidates':>11s} {'reduction':>10s}")
+    for label, (tokens, candidates) in report.items():
+        reduction = 1 - tokens / baseline if baseline else 0.0
+        print(f"  {label:20s} {tokens:8d} {tokens / max(queries, 1):10.1f} "
+              f"{candidates:11d} {reduction:10.1%}")
+
+
+if __name__ == "__main__":
+    main()
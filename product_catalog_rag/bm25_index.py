@@ -0,0 +1,435 @@
+import json
+import os
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from index_store import load_or_build as _load_or_build, write_dir
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BM25_DIR = "bm25_index"
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+_ARRAYS = ("doc_len", "fwd_indptr", "fwd_terms", "fwd_tf")
+TF_MAX = np.iinfo(np.uint16).max  # term frequencies are stored as uint16
+
+
+def tokenize(text: str):
+    return re.findall(r"\b\w+\b", text.lower())
+
+
+def id_array(ids) -> np.ndarray:
+    # fixed-width unicode array: no per-id Python objects, memory-mappable
+    ids = [str(i) for i in ids]
+    return np.array(ids) if ids else np.zeros(0, dtype="<U1")
+
+
+def in_bitmap(bitmap: np.ndarray, positions) -> np.ndarray:
+    """Membership of `positions` in a np.packbits document bitmap."""
+    positions = np.asarray(positions, dtype=np.int64)
+    return (bitmap[positions >> 3] >> (7 - (positions & 7)) & 1).astype(bool)
+
+
+def id_positions(doc_ids: np.ndarray, doc_order: np.ndarray, ids) -> np.ndarray:
+    """Positions of `ids` in `doc_ids` (-1 when absent); `doc_order` sorts `doc_ids`."""
+    ids = id_array(ids)
+    if not len(ids) or not len(doc_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    rows = np.searchsorted(doc_ids, ids, sorter=doc_order)
+    rows = np.minimum(rows, len(doc_ids) - 1)
+    pos = np.asarray(doc_order[rows], dtype=np.int64)
+    return np.where(doc_ids[pos] == ids, pos, -1)
+
+
+# =====================================================
+# PERSISTENT BM25 INDEX
+# =====================================================
+class BM25Index:
+    """
+    Okapi BM25 (same scoring as rank_bm25.BM25Okapi) over a persisted,
+    memory-mappable corpus.
+
+    On disk (one directory, next to chroma_db/):
+      meta.json      -> parameters
+      vocab.json     -> term list, term id = position
+      doc_ids.npy    -> Chroma ids, doc index = position
+      doc_order.npy  -> doc positions sorted by id, for id -> position lookups
+      doc_len.npy    -> tokens per document
+      fwd_*.npy      -> forward index (doc -> term ids / uint16 term frequencies)
+      inv_*.npy      -> inverted index (term -> doc indices / term frequencies)
+      inv_ub.npy     -> per-term max tf component, for max-score pruning
+
+    The forward index is what makes updates incremental: changed rows are
+    re-tokenized, everything else is re-used as integer arrays. Apart from
+    the vocabulary, nothing is held as per-document Python objects.
+    """
+
+    def __init__(self, vocab, doc_ids, doc_len, fwd_indptr, fwd_terms, fwd_tf,
+                 inv=None, term_ub=None, doc_order=None, k1=K1, b=B, epsilon=EPSILON):
+        self.vocab = vocab
+        self.term_ids = {t: i for i, t in enumerate(vocab)}
+        self.doc_ids = doc_ids if isinstance(doc_ids, np.ndarray) else id_array(doc_ids)
+        self.doc_order = (
+            doc_order if doc_order is not None
+            else np.argsort(self.doc_ids, kind="stable").astype(np.int32)
+        )
+        self.doc_len = doc_len
+        self.fwd_indptr = fwd_indptr
+        self.fwd_terms = fwd_terms
+        self.fwd_tf = fwd_tf
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        if inv is None:
+            inv = self._invert()
+        self.inv_indptr, self.inv_docs, self.inv_tf = inv
+        self._refresh_stats()
+        self.term_ub = term_ub if term_ub is not None else self._term_bounds()
+
+    # -----------------------------
+    # Build / update
+    # -----------------------------
+    @classmethod
+    def build(cls, ids, documents, **params):
+        builder = BM25Builder(**params)
+        builder.add(ids, documents)
+        return builder.build()
+
+    def positions(self, ids) -> np.ndarray:
+        """Doc positions of the Chroma `ids` (-1 for ids not in the index)."""
+        return id_positions(self.doc_ids, self.doc_order, ids)
+
+    def upsert(self, ids, documents):
+        """Return a new index with `ids` added or replaced by `documents`."""
+        ids = [str(i) for i in ids]
+        base = self.delete(ids) if (self.positions(ids) >= 0).any() else self
+
+        builder = BM25Builder(base)
+        builder.add(ids, documents)
+        return builder.build()
+
+    def delete(self, ids):
+        """Return a new index without `ids` (unknown ids are ignored)."""
+        drop = self.positions(ids)
+        drop = drop[drop >= 0]
+        if not len(drop):
+            return self
+
+        keep = np.ones(len(self.doc_ids), dtype=bool)
+        keep[drop] = False
+        counts = np.diff(self.fwd_indptr)
+        token_keep = np.repeat(keep, counts)
+
+        return BM25Index(
+            self.vocab,
+            np.asarray(self.doc_ids)[keep],
+            np.asarray(self.doc_len)[keep],
+            np.concatenate([[0], np.cumsum(counts[keep])]).astype(np.int64),
+            np.asarray(self.fwd_terms)[token_keep],
+            np.asarray(self.fwd_tf)[token_keep],
+            k1=self.k1, b=self.b, epsilon=self.epsilon,
+        )
+
+    def _invert(self):
+        n_docs = len(self.doc_ids)
+        doc_of_token = np.repeat(
+            np.arange(n_docs, dtype=np.int32), np.diff(self.fwd_indptr)
+        )
+        order = np.argsort(self.fwd_terms, kind="stable")
+        df = np.bincount(self.fwd_terms, minlength=len(self.vocab))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        return indptr, doc_of_token[order], np.asarray(self.fwd_tf)[order]
+
+    def _refresh_stats(self):
+        self.num_docs = len(self.doc_ids)
+        self.avgdl = float(np.mean(self.doc_len)) if self.num_docs else 0.0
+
+        # rank_bm25: idf = log(N - n + 0.5) - log(n + 0.5), negative idfs
+        # are floored at epsilon * average idf of the corpus terms
+        df = np.diff(self.inv_indptr).astype(np.float64)
+        present = df > 0
+        idf = np.zeros(len(self.vocab), dtype=np.float64)
+        idf[present] = (
+            np.log(self.num_docs - df[present] + 0.5) - np.log(df[present] + 0.5)
+        )
+        if present.any():
+            eps = self.epsilon * idf[present].mean()
+            idf[present & (idf < 0)] = eps
+        self.idf = idf
+
+        if self.num_docs:
+            self.len_norm = self.k1 * (
+                1 - self.b + self.b * np.asarray(self.doc_len) / self.avgdl
+            )
+        else:
+            self.len_norm = np.zeros(0)
+
+    def _term_bounds(self):
+        # max over each postings list of tf * (k1 + 1) / (tf + len_norm);
+        # multiplied by idf this bounds what a term can add to any document
+        bounds = np.zeros(len(self.vocab), dtype=np.float64)
+        if not len(self.inv_docs):
+            return bounds
+        tf = np.asarray(self.inv_tf, dtype=np.float64)
+        parts = tf * (self.k1 + 1) / (tf + self.len_norm[self.inv_docs])
+        nonempty = np.diff(self.inv_indptr) > 0
+        bounds[nonempty] = np.maximum.reduceat(parts, self.inv_indptr[:-1][nonempty])
+        return bounds
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def _query_terms(self, tokens):
+        """(term id, query tf, score upper bound), highest bound first."""
+        counts = Counter(self.term_ids[t] for t in tokens if t in self.term_ids)
+        terms = [
+            (tid, qtf, qtf * self.idf[tid] * self.term_ub[tid])
+            for tid, qtf in counts.items()
+        ]
+        return sorted(terms, key=lambda t: t[2], reverse=True)
+
+    def _contrib(self, tid, qtf, rows=None):
+        start, end = self.inv_indptr[tid], self.inv_indptr[tid + 1]
+        docs = self.inv_docs[start:end]
+        tf = self.inv_tf[start:end]
+        if rows is not None:
+            docs, tf = docs[rows], tf[rows]
+        return docs, qtf * self.idf[tid] * tf * (self.k1 + 1) / (tf + self.len_norm[docs])
+
+    def _lookup(self, tid, doc_idx):
+        """Rows of `doc_idx` within the postings of `tid` (-1 when absent)."""
+        start, end = self.inv_indptr[tid], self.inv_indptr[tid + 1]
+        docs = self.inv_docs[start:end]
+        rows = np.searchsorted(docs, doc_idx)
+        found = rows < len(docs)
+        found[found] = docs[rows[found]] == doc_idx[found]
+        return np.where(found, rows, -1)
+
+    def score_docs(self, tokens, doc_idx) -> np.ndarray:
+        """BM25 scores for the given document positions only."""
+        doc_idx = np.asarray(doc_idx, dtype=np.int64)
+        scores = np.zeros(len(doc_idx), dtype=np.float64)
+        for tid, qtf, _ in self._query_terms(tokens):
+            rows = self._lookup(tid, doc_idx)
+            hit = rows >= 0
+            if hit.any():
+                scores[hit] += self._contrib(tid, qtf, rows[hit])[1]
+        return scores
+
+    def top_k(self, tokens, k: int, allowed: np.ndarray = None, postings: dict = None):
+        """
+        [(doc position, score)] for the k best positive-scoring documents,
+        restricted to the documents set in the packed bitmap `allowed`.
+        `postings` memoizes decoded postings across calls (see top_k_batch).
+
+        Term-at-a-time max-score: terms are processed from the highest score
+        bound down; once the bounds of the remaining terms cannot lift an
+        unseen document past the current k-th score, their postings are only
+        probed for existing candidates (binary search) instead of scanned.
+        Cost follows the postings of the rare query terms, not corpus size.
+        """
+        terms = self._query_terms(tokens)
+        if not terms or k <= 0:
+            return []
+
+        cand_docs = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        admitting = True
+
+        for i, (tid, qtf, _) in enumerate(terms):
+            remaining = sum(ub for _, _, ub in terms[i + 1:])
+
+            if admitting:
+                if postings is None:
+                    docs, contrib = self._contrib(tid, qtf)
+                else:
+                    if tid not in postings:
+                        postings[tid] = self._contrib(tid, 1)
+                    docs, contrib = postings[tid]
+                    contrib = qtf * contrib
+                if allowed is not None:
+                    keep = in_bitmap(allowed, docs)
+                    docs, contrib = docs[keep], contrib[keep]
+                merged = np.union1d(cand_docs, docs)
+                scores = np.zeros(len(merged), dtype=np.float64)
+                scores[np.searchsorted(merged, cand_docs)] += cand_scores
+                scores[np.searchsorted(merged, docs)] += contrib
+                cand_docs, cand_scores = merged, scores
+            else:
+                rows = self._lookup(tid, cand_docs)
+                hit = rows >= 0
+                if hit.any():
+                    cand_scores[hit] += self._contrib(tid, qtf, rows[hit])[1]
+
+            if len(cand_scores) < k:
+                continue
+            threshold = np.partition(cand_scores, -k)[-k]
+            if remaining <= threshold:
+                admitting = False
+                keep = cand_scores + remaining >= threshold
+                cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+
+        n_top = min(k, len(cand_scores))
+        if not n_top:
+            return []
+        top = np.argpartition(-cand_scores, n_top - 1)[:n_top]
+        top = top[np.argsort(-cand_scores[top])]
+        return [
+            (int(cand_docs[i]), float(cand_scores[i]))
+            for i in top
+            if cand_scores[i] > 0
+        ]
+
+    def top_k_batch(self, token_lists, k: int, allowed: list = None) -> list:
+        """
+        top_k() for every query of a batch (`allowed`: one bitmap or None
+        per query). The postings of a term shared by several queries are
+        read and scored once for the whole batch.
+        """
+        postings = {}
+        allowed = allowed or [None] * len(token_lists)
+        return [self.top_k(tokens, k, bitmap, postings) for tokens, bitmap in zip(token_lists, allowed)]
+
+    def get_scores(self, tokens) -> np.ndarray:
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for term in tokens:
+            tid = self.term_ids.get(term)
+            if tid is None:
+                continue
+            start, end = self.inv_indptr[tid], self.inv_indptr[tid + 1]
+            docs = self.inv_docs[start:end]
+            tf = self.inv_tf[start:end]
+            scores[docs] += self.idf[tid] * tf * (self.k1 + 1) / (tf + self.len_norm[docs])
+        return scores
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: str = BM25_DIR):
+        """Write to the new directory `path` (see index_store.write_dir)."""
+        write_dir(path, self._write)
+
+    def _write(self, path: str):
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "epsilon": self.epsilon}, f)
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f)
+        np.save(os.path.join(path, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(path, "doc_order.npy"), self.doc_order)
+
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(path, "inv_indptr.npy"), self.inv_indptr)
+        np.save(os.path.join(path, "inv_docs.npy"), self.inv_docs)
+        np.save(os.path.join(path, "inv_tf.npy"), self.inv_tf)
+        np.save(os.path.join(path, "inv_ub.npy"), self.term_ub)
+
+    @classmethod
+    def load(cls, path: str = BM25_DIR, mmap: bool = True):
+        mode = "r" if mmap else None
+
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            params = json.load(f)
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            vocab = json.load(f)
+        doc_order = None
+        if os.path.exists(os.path.join(path, "doc_ids.npy")):
+            doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode=mode)
+            doc_order = np.load(os.path.join(path, "doc_order.npy"), mmap_mode=mode)
+        else:
+            # indexes written before ids were stored as an array
+            with open(os.path.join(path, "doc_ids.json"), encoding="utf-8") as f:
+                doc_ids = json.load(f)
+
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS]
+        inv = tuple(
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in ("inv_indptr", "inv_docs", "inv_tf")
+        )
+        ub_path = os.path.join(path, "inv_ub.npy")
+        term_ub = np.load(ub_path) if os.path.exists(ub_path) else None
+        return cls(vocab, doc_ids, *arrays, inv=inv, term_ub=term_ub, doc_order=doc_order, **params)
+
+
+# =====================================================
+# STREAMING BUILDER
+# =====================================================
+class BM25Builder:
+    """
+    Accumulates documents chunk by chunk as compact integer arrays, so an
+    index can be built while streaming a catalog without holding its text.
+    """
+
+    def __init__(self, base: BM25Index = None, k1=K1, b=B, epsilon=EPSILON):
+        self.base = base
+        self.params = (
+            {"k1": base.k1, "b": base.b, "epsilon": base.epsilon} if base is not None
+            else {"k1": k1, "b": b, "epsilon": epsilon}
+        )
+        self.vocab = list(base.vocab) if base is not None else []
+        self.term_ids = dict(base.term_ids) if base is not None else {}
+        self.ids = []
+        self.terms = array("i")
+        self.tfs = array("H")
+        self.lens = array("i")
+        self.ends = array("q")
+
+    def add(self, ids, documents):
+        for doc_id, doc in zip(ids, documents):
+            counts = Counter(tokenize(doc))
+            for term, tf in counts.items():
+                tid = self.term_ids.get(term)
+                if tid is None:
+                    tid = self.term_ids[term] = len(self.vocab)
+                    self.vocab.append(term)
+                self.terms.append(tid)
+                self.tfs.append(min(tf, TF_MAX))
+            self.ids.append(str(doc_id))
+            self.lens.append(sum(counts.values()))
+            self.ends.append(len(self.terms))
+
+    def build(self) -> BM25Index:
+        base = self.base
+        if base is None:
+            base = BM25Index([], [], *_empty_forward(), **self.params)
+
+        offset = len(base.fwd_terms)
+        return BM25Index(
+            self.vocab,
+            np.concatenate([base.doc_ids, id_array(self.ids)]),
+            np.concatenate([base.doc_len, np.frombuffer(self.lens, dtype=np.int32)]),
+            np.concatenate([base.fwd_indptr, np.frombuffer(self.ends, dtype=np.int64) + offset]),
+            np.concatenate([base.fwd_terms, np.frombuffer(self.terms, dtype=np.int32)]),
+            np.concatenate([base.fwd_tf, np.frombuffer(self.tfs, dtype=np.uint16)]).astype(np.uint16),
+            **self.params,
+        )
+
+
+def _empty_forward():
+    return (
+        np.zeros(0, dtype=np.int32),
+        np.zeros(1, dtype=np.int64),
+        np.zeros(0, dtype=np.int32),
+        np.zeros(0, dtype=np.uint16),
+    )
+
+
+def build_from_collection(collection, batch_size: int = 5000) -> BM25Index:
+    """Build an index by paging through an existing Chroma collection."""
+    builder = BM25Builder()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        builder.add(page["ids"], page["documents"])
+    return builder.build()
+
+
+def load_or_build(collection, path: str = BM25_DIR) -> BM25Index:
+    return _load_or_build(path, BM25Index.load, lambda: build_from_collection(collection))
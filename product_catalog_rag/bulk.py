@@ -0,0 +1,199 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+
+from logic import NORMALIZER_MODE, TOP_K, match_async, normalization_metrics
+from decision import get_fast_path, selection_metrics
+from selection_cache import get_selection_cache
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "8"))  # orders matched concurrently
+TEXT_FIELD = "text"
+ID_FIELD = "id"
+SYNC_EVERY = 50        # fsync the output after this many records
+PROGRESS_EVERY = 100   # records between progress lines
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# BULK MATCHING
+# =====================================================
+# Matches a JSONL or CSV file of orders (one order paragraph per record)
+# and appends one JSONL line per finished order:
+#
+#   {"id": "<record id>", "results": [<selection records>]}
+#
+# The output file is the checkpoint. On restart, records whose id is
+# already in it are skipped, and a line torn by a crash is cut off. Orders
+# that were in flight are matched again, but their Stage 0 and Stage 2
+# answers come from the persistent LLM and selection caches, so only work
+# that never finished is paid for twice. Failed orders go to
+# <output>.errors.jsonl and are retried on the next run.
+
+_DONE = object()
+
+
+def default_output(input_file: str) -> str:
+    return f"{os.path.splitext(input_file)[0]}.matched.jsonl"
+
+
+def read_records(path: str, text_field: str = TEXT_FIELD, id_field: str = ID_FIELD):
+    """
+    (record id, order text) for every record, read lazily. JSONL lines are
+    objects with `text_field` (or bare strings); CSV needs a header row.
+    Records without `id_field` are numbered by position: "#1", "#2", ...
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for n, row in enumerate(rows, 1):
+            if isinstance(row, str):
+                row = {text_field: row}
+            if text_field not in row:
+                raise ValueError(f"{path}: record {n} has no {text_field!r} field")
+            record_id = row.get(id_field)
+            yield (f"#{n}" if record_id in (None, "") else str(record_id)), str(row[text_field] or "")
+
+
+def completed_ids(path: str) -> set:
+    """Ids already in the output file; a torn last line is truncated away."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "rb+") as f:
+        good = 0
+        for line in f:
+            # a line without its newline is torn even when it parses
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record_id = json.loads(line)["id"]
+            except (ValueError, KeyError, TypeError):
+                break
+            done.add(record_id)
+            good += len(line)
+        if good < f.seek(0, os.SEEK_END):
+            logger.warning("Truncating %s after %d bytes (incomplete last record)", path, good)
+            f.truncate(good)
+    return done
+
+
+class JSONLWriter:
+    """Appends one JSON object per line; flushed per line, fsynced every `sync_every` lines."""
+
+    def __init__(self, path: str, mode: str = "a", sync_every: int = SYNC_EVERY):
+        self.f = open(path, mode, encoding="utf-8")
+        self.sync_every = sync_every
+        self.count = 0
+
+    def write(self, record: dict):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self.count += 1
+        if self.count % self.sync_every == 0:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+
+async def match_file(input_file: str, output_file: str, retriever, llm_client,
+                     workers: int = BULK_WORKERS, top_k: int = TOP_K, selection_cache=None,
+                     fast_path=None, normalizer_mode: str = NORMALIZER_MODE, filters: dict = None,
+                     text_field: str = TEXT_FIELD, id_field: str = ID_FIELD, resume: bool = True) -> dict:
+    """
+    Match every record of `input_file` with `workers` orders in flight,
+    appending results to `output_file` as they finish. Returns counts.
+    """
+    workers = max(1, workers)
+    done = completed_ids(output_file) if resume else set()
+    output = JSONLWriter(output_file, "a" if resume else "w")
+    errors = JSONLWriter(f"{output_file}.errors.jsonl", "w")
+    queue = asyncio.Queue(workers * 2)
+    stats = {"matched": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    async def feed():
+        for record_id, text in read_records(input_file, text_field, id_field):
+            if record_id in done:
+                stats["skipped"] += 1
+                continue
+            done.add(record_id)  # a duplicate id later in the file is skipped too
+            await queue.put((record_id, text))
+        for _ in range(workers):
+            await queue.put(_DONE)
+
+    async def work():
+        while (item := await queue.get()) is not _DONE:
+            record_id, text = item
+            try:
+                results = await match_async(
+                    text, retriever, llm_client, top_k, selection_cache, fast_path, normalizer_mode, filters
+                ) if text.strip() else []
+            except Exception as e:
+                logger.warning("Order %s failed", record_id, exc_info=True)
+                errors.write({"id": record_id, "error": f"{type(e).__name__}: {e}"})
+                stats["failed"] += 1
+                continue
+
+            output.write({"id": record_id, "results": results})
+            stats["matched"] += 1
+            finished = stats["matched"] + stats["failed"]
+            if finished % PROGRESS_EVERY == 0:
+                print(f"{finished} orders ({finished / (time.perf_counter() - start):.1f}/s), "
+                      f"{stats['failed']} failed")
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        output.close()
+        errors.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def run(input_file: str, output_file: str = None, llm_backend: str = None, workers: int = BULK_WORKERS,
+        top_k: int = TOP_K, normalizer_mode: str = NORMALIZER_MODE, filters: dict = None,
+        text_field: str = TEXT_FIELD, id_field: str = ID_FIELD, restart: bool = False):
+    """
+    Bulk-match `input_file` (.jsonl or .csv) into `output_file` (JSONL,
+    default <input>.matched.jsonl), resuming from it unless `restart`.
+    """
+    # chromadb / embedding model are only loaded once there is work to do
+    from llm_client import new_async_llm
+    from retrieval import HybridRetriever
+
+    output_file = output_file or default_output(input_file)
+    retriever = HybridRetriever(debug=False)
+
+    async def main():
+        llm_client = new_async_llm(llm_backend)
+        try:
+            return await match_file(
+                input_file, output_file, retriever, llm_client, workers, top_k,
+                get_selection_cache(), get_fast_path(), normalizer_mode, filters,
+                text_field, id_field, resume=not restart
+            )
+        finally:
+            await llm_client.aclose()
+
+    stats = asyncio.run(main())
+    print(f"Bulk run: {stats}")
+    print(f"Normalization paths: {normalization_metrics.stats()}")
+    print(f"Selection paths: {selection_metrics.stats()}")
+    print(f"Results in {output_file}")
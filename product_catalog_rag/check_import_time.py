@@ -0,0 +1,97 @@
+"""
+Import-time regression check for the entry points, based on
+`python -X importtime`.
+
+    python check_import_time.py            # exit code 1 on a regression
+    python check_import_time.py --verbose  # also list the slowest imports
+    python check_import_time.py --scale 2  # looser budgets on a slow box
+
+For each entry point it fails if one of the heavy packages (torch,
+chromadb, langchain, pandas, ...) gets imported at module load, or if
+the cumulative import time goes over the budget.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# packages that must only be imported when they are actually used
+HEAVY = {
+    "torch", "sentence_transformers", "transformers", "onnxruntime", "tokenizers",
+    "chromadb", "langchain_groq", "langchain_core", "pandas", "openpyxl", "pyarrow", "rank_bm25",
+}
+
+# (label, python arguments, budget in ms for the top-level imports)
+ENTRY_POINTS = [
+    ("cli.py --help", ["cli.py", "--help"], 60),
+    ("import cli", ["-c", "import cli"], 60),
+    ("import utils", ["-c", "import utils"], 150),
+    ("import logic", ["-c", "import logic"], 400),
+    ("import bulk", ["-c", "import bulk"], 400),
+    ("import retrieval", ["-c", "import retrieval"], 400),
+    ("import add_data_to_db", ["-c", "import add_data_to_db"], 400),
+    ("import server", ["-c", "import server"], 500),
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def profile(args: list[str]):
+    """[(module, cumulative_us, depth)] from `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"python {' '.join(args)} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            imports.append((module, int(cumulative), len(indent) // 2))
+    return imports
+
+
+def check(label: str, args: list[str], budget_ms: float, verbose: bool = False) -> list[str]:
+    imports = profile(args)
+    # site / encodings are interpreter startup, not ours
+    total_ms = sum(us for module, us, depth in imports
+                   if depth == 0 and module not in ("site", "encodings")) / 1000
+    heavy = sorted({m.split(".")[0] for m, _, _ in imports} & HEAVY)
+
+    problems = []
+    if heavy:
+        problems.append(f"{label}: imports {', '.join(heavy)} at load time")
+    if total_ms > budget_ms:
+        problems.append(f"{label}: {total_ms:.0f} ms of imports (budget {budget_ms:.0f} ms)")
+
+    status = "FAIL" if problems else "ok"
+    print(f"  {status:4s}  {label:28s} {total_ms:7.1f} ms  (budget {budget_ms:.0f} ms)")
+    if verbose:
+        ours = [i for i in imports if i[2] <= 1 and i[0] not in ("site", "encodings")]
+        for module, us, _ in sorted(ours, key=lambda i: -i[1])[:8]:
+            print(f"          {us / 1000:7.1f} ms  {module}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    problems = []
+    for label, entry_args, budget_ms in ENTRY_POINTS:
+        problems += check(label, entry_args, budget_ms * args.scale, args.verbose)
+
+    if problems:
+        print("\n" + "\n".join(problems))
+        return 1
+    print("\nImport times within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,9 @@
 import streamlit as st
 import chromadb
 import pandas as pd
-from chromadb.utils import embedding_functions
+
+from embedder import EMBEDDING_BACKEND, make_embedder
+from index_pointer import read_pointer
 
 # -------------------------------------------------
 # CONFIG
@@ -26,20 +28,27 @@ st.caption("Inspect documents, metadata, and embeddings stored in ChromaDB")
 # INIT CHROMA CLIENT
 # -------------------------------------------------
 @st.cache_resource
-def load_collection():
-    embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL
-    )
-
+def load_collection(name):
     client = chromadb.PersistentClient(path=CHROMA_DIR)
 
+    # vectors come from our embedder (as at ingest), Chroma never embeds
     collection = client.get_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_function
+        name=name,
+        embedding_function=None
     )
     return collection
 
-collection = load_collection()
+
+@st.cache_resource
+def load_embedder(model_name):
+    # same factory and backend (EMBEDDING_BACKEND) as ingest and retrieval
+    return make_embedder(EMBEDDING_BACKEND, model_name, workers=1)
+
+# active versioned collection after a re-index, original name before the first one
+active_index = read_pointer()
+collection = load_collection(active_index["collection"] if active_index else COLLECTION_NAME)
+embedding_model = active_index.get("embedding_model", EMBEDDING_MODEL) if active_index else EMBEDDING_MODEL
+st.caption(f"Collection: {collection.name}")
 
 # -------------------------------------------------
 # COLLECTION STATS
@@ -113,6 +122,31 @@ st.dataframe(
     height=600
 )
 
+# -------------------------------------------------
+# SEMANTIC SEARCH
+# -------------------------------------------------
+st.subheader("Semantic Search")
+
+search_query = st.text_input("Query (embedded with the ingest embedder)")
+
+if search_query.strip():
+    results = collection.query(
+        query_embeddings=load_embedder(embedding_model)([search_query]),
+        n_results=10,
+        include=["metadatas", "distances"]
+    )
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "Product ID": meta.get("product_id"),
+                "Product Name": meta.get("product_name"),
+                "Distance": round(dist, 4)
+            }
+            for meta, dist in zip(results["metadatas"][0], results["distances"][0])
+        ]),
+        use_container_width=True
+    )
+
 # -------------------------------------------------
 # RAW RECORD VIEWER
 # -------------------------------------------------
@@ -0,0 +1,212 @@
+"""
+Product catalog matcher.
+
+    python cli.py ingest  [--input data/product_catalog.xlsx] [--sync] [--backend onnx] ...
+    python cli.py match   [--input input.txt] [--output output.txt] [--llm stub] [--filter status=Active] [--pipeline] ...
+    python cli.py bulk    --input orders.jsonl [--output orders.matched.jsonl] [--workers 8] [--restart] ...
+    python cli.py serve   [--host 127.0.0.1] [--port 8080] [--llm stub]
+    python cli.py inspect [--chroma]
+
+Only the standard library is imported until a subcommand runs, and each
+subcommand imports just what it needs (chromadb, the embedding model and
+langchain are loaded when they are actually used). check_import_time.py
+keeps it that way.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def _given(args, *names) -> dict:
+    # only forward options the user set, so the modules' own defaults apply
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+# =====================================================
+# SUBCOMMANDS
+# =====================================================
+def cmd_ingest(args):
+    from add_data_to_db import rebuild, sync
+
+    run = sync if args.sync else rebuild
+    run(**_given(args, "path", "chunk_size", "batch_size", "workers", "embed_batch_size", "backend"))
+
+
+def cmd_match(args):
+    from logic import run
+
+    options = _given(args, "input_file", "output_file", "llm_backend", "top_k", "normalizer_mode")
+    if args.filters:
+        options["filters"] = _parse_filters(args.filters)
+    run(verbose=not args.quiet, pipelined=args.pipeline, **options)
+
+
+def cmd_bulk(args):
+    from bulk import run
+
+    options = _given(args, "output_file", "llm_backend", "workers", "top_k", "normalizer_mode",
+                     "text_field", "id_field")
+    if args.filters:
+        options["filters"] = _parse_filters(args.filters)
+    run(args.input_file, restart=args.restart, **options)
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def _parse_filters(pairs) -> dict:
+    # --filter category=CPU --filter status=Active --filter status=Legacy
+    filters = {}
+    for pair in pairs:
+        facet, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"--filter expects FACET=VALUE, got {pair!r}")
+        filters.setdefault(facet.strip(), []).append(value.strip())
+    return filters
+
+
+def cmd_serve(args):
+    from server import run
+
+    run(**_given(args, "host", "port", "llm_backend"))
+
+
+def cmd_inspect(args):
+    """Index and cache state, without loading any model."""
+    from bm25_index import BM25_DIR, BM25Index
+    from identifier_index import IDENT_DIR, IdentifierIndex
+    from index_pointer import read_pointer
+
+    record = read_pointer()
+    bm25_dir = record["bm25_dir"] if record else BM25_DIR
+    info = {"active_index": record}
+
+    if os.path.exists(os.path.join(bm25_dir, "meta.json")):
+        bm25 = BM25Index.load(bm25_dir)
+        info["bm25"] = {
+            "dir": bm25_dir,
+            "documents": bm25.num_docs,
+            "vocabulary": len(bm25.vocab),
+            "avg_doc_len": round(bm25.avgdl, 2),
+        }
+
+    ident_dir = (record or {}).get("identifier_dir", IDENT_DIR)
+    if os.path.exists(os.path.join(ident_dir, "keys.npy")):
+        ident = IdentifierIndex.load(ident_dir)
+        info["identifiers"] = {"dir": ident_dir, "keys": len(ident.keys), "postings": len(ident.postings)}
+
+    from add_data_to_db import MANIFEST_PATH, load_manifest
+
+    manifest = load_manifest(MANIFEST_PATH)
+    info["manifest_rows"] = len(manifest) if manifest is not None else None
+
+    if args.chroma:
+        import chromadb
+
+        from add_data_to_db import CHROMA_DIR, COLLECTION_NAME
+
+        client = chromadb.PersistentClient(path=CHROMA_DIR)
+        name = record["collection"] if record else COLLECTION_NAME
+        collection = client.get_collection(name, embedding_function=None)
+        info["chroma"] = {"collection": name, "count": collection.count()}
+
+    info["caches"] = _cache_stats()
+    print(json.dumps(info, indent=2, default=str))
+
+
+def _cache_stats() -> dict:
+    # never create a cache just to report that it is empty
+    from embedding_cache import EMBEDDING_CACHE_DIR, EmbeddingCache
+    from llm_cache import LLM_CACHE_PATH, LLMCache
+    from selection_cache import SELECTION_CACHE_PATH, SelectionCache
+
+    stats = {}
+    for name, path, factory in (
+        ("llm", LLM_CACHE_PATH, LLMCache),
+        ("selection", SELECTION_CACHE_PATH, SelectionCache),
+    ):
+        stats[name] = factory(path).stats() if os.path.exists(path) else None
+
+    stats["embeddings"] = {}
+    if os.path.isdir(EMBEDDING_CACHE_DIR):
+        for entry in sorted(os.listdir(EMBEDDING_CACHE_DIR)):
+            meta_path = os.path.join(EMBEDDING_CACHE_DIR, entry, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    model = json.load(f)["model"]
+                stats["embeddings"][model] = EmbeddingCache(model).count
+    return stats
+
+
+# =====================================================
+# ARGUMENTS
+# =====================================================
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="index the product catalog into ChromaDB + BM25")
+    ingest.add_argument("--input", dest="path", help="catalog file: .xlsx, .csv or .parquet")
+    ingest.add_argument("--sync", action="store_true",
+                        help="incremental: only re-embed new/changed rows and delete removed ones")
+    ingest.add_argument("--chunk-size", type=int)
+    ingest.add_argument("--batch-size", type=int)
+    ingest.add_argument("--workers", type=int, help="embedding processes")
+    ingest.add_argument("--embed-batch-size", type=int)
+    ingest.add_argument("--backend", choices=["torch", "onnx"], help="embedding backend")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    match = commands.add_parser("match", help="match the items in an input file against the catalog")
+    match.add_argument("--input", dest="input_file", help="raw input text (default input.txt)")
+    match.add_argument("--output", dest="output_file", help="selection records JSON (default output.txt)")
+    match.add_argument("--llm", dest="llm_backend", help="LLM backend: groq (default) or stub")
+    match.add_argument("--top-k", type=int)
+    match.add_argument("--normalizer", dest="normalizer_mode", choices=["llm", "local", "auto"])
+    match.add_argument("--filter", dest="filters", action="append", metavar="FACET=VALUE",
+                       help="only retrieve products with this category / brand / status (repeatable)")
+    match.add_argument("--pipeline", action="store_true",
+                       help="overlap normalization, retrieval and selection (async LLM client)")
+    match.add_argument("--quiet", action="store_true", help="no retrieval debug output")
+    match.set_defaults(handler=cmd_match)
+
+    bulk = commands.add_parser("bulk", help="match a JSONL / CSV file of orders, resumable")
+    bulk.add_argument("--input", dest="input_file", required=True,
+                      help="orders: .jsonl (objects or strings) or .csv with a header row")
+    bulk.add_argument("--output", dest="output_file", help="JSONL results, also the checkpoint "
+                                                           "(default <input>.matched.jsonl)")
+    bulk.add_argument("--workers", type=_positive_int, help="orders matched concurrently")
+    bulk.add_argument("--text-field", help="field / column holding the order text (default text)")
+    bulk.add_argument("--id-field", help="field / column holding the order id (default id)")
+    bulk.add_argument("--restart", action="store_true", help="ignore existing results and start over")
+    bulk.add_argument("--llm", dest="llm_backend", help="LLM backend: groq (default) or stub")
+    bulk.add_argument("--top-k", type=int)
+    bulk.add_argument("--normalizer", dest="normalizer_mode", choices=["llm", "local", "auto"])
+    bulk.add_argument("--filter", dest="filters", action="append", metavar="FACET=VALUE",
+                      help="only retrieve products with this category / brand / status (repeatable)")
+    bulk.set_defaults(handler=cmd_bulk)
+
+    serve = commands.add_parser("serve", help="run the HTTP matching service")
+    serve.add_argument("--host")
+    serve.add_argument("--port", type=int)
+    serve.add_argument("--llm", dest="llm_backend", help="LLM backend: groq (default) or stub")
+    serve.set_defaults(handler=cmd_serve)
+
+    inspect = commands.add_parser("inspect", help="show the active index and cache state")
+    inspect.add_argument("--chroma", action="store_true", help="also open Chroma for the document count")
+    inspect.set_defaults(handler=cmd_inspect)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import os
+import threading
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+FAST_PATH_ENABLED = os.getenv("FAST_PATH", "1") != "0"
+MIN_TOP_SCORE = float(os.getenv("FAST_PATH_MIN_TOP_SCORE", "0.75"))
+MIN_MARGIN = float(os.getenv("FAST_PATH_MIN_MARGIN", "0.15"))
+REQUIRE_IDENTIFIER_MATCH = True
+
+
+# =====================================================
+# RULE-BASED FAST PATH
+# =====================================================
+class FastPathDecider:
+    """
+    Decides a query without the Stage 2 LLM when the top hybrid candidate
+    is clearly ahead: hybrid score >= min_top_score, lead over the next
+    candidate >= min_margin and (by default) an exact model-number match
+    with the query. Anything else is left to build_llm_prompt_batch.
+    """
+
+    def __init__(self, min_top_score: float = MIN_TOP_SCORE, min_margin: float = MIN_MARGIN,
+                 require_identifier_match: bool = REQUIRE_IDENTIFIER_MATCH):
+        self.min_top_score = min_top_score
+        self.min_margin = min_margin
+        self.require_identifier_match = require_identifier_match
+
+    def decide(self, item: dict):
+        """Selection record for a batch_data item, or None if it is ambiguous."""
+        candidates = sorted(item["candidates"], key=lambda c: c["hybrid_score"], reverse=True)
+        if not candidates:
+            return None
+
+        top = candidates[0]
+        runner_up = candidates[1]["hybrid_score"] if len(candidates) > 1 else 0.0
+        margin = top["hybrid_score"] - runner_up
+        # numeric_match is a weight; prefix and fuzzy hits are near-misses, not matches
+        identifier_match = bool(top.get("exact_identifier"))
+
+        if top["hybrid_score"] < self.min_top_score or margin < self.min_margin:
+            return None
+        if self.require_identifier_match and not identifier_match:
+            return None
+
+        confidence = "high" if margin >= 2 * self.min_margin else "medium"
+        reason = (
+            f"Rule-based: hybrid score {top['hybrid_score']:.2f}, "
+            f"{margin:.2f} ahead of the next candidate"
+        )
+        if identifier_match:
+            reason += ", model number matches the query"
+
+        return {
+            "input_query": item["query"],
+            "selected_product_id": top["product_id"],
+            "selected_product_name": top["product_name"],
+            "confidence": confidence,
+            "reason": reason
+        }
+
+
+class PathMetrics:
+    """How many queries each path resolved, e.g. rule / cache / llm."""
+
+    def __init__(self, *paths: str):
+        self._lock = threading.Lock()
+        self.counts = {path: 0 for path in paths}
+
+    def record(self, path: str, n: int = 1):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + n
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "llm_bypass_rate": round(1 - counts.get("llm", 0) / total, 4) if total else 0.0,
+        }
+
+
+selection_metrics = PathMetrics("rule", "cache", "llm")
+
+
+def get_fast_path():
+    """The configured decider, or None when disabled with FAST_PATH=0."""
+    return FastPathDecider() if FAST_PATH_ENABLED else None
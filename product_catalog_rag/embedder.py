@@ -0,0 +1,185 @@
+import json
+import os
+
+import numpy as np
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "1") != "0"
+
+
+# =====================================================
+# PARALLEL DOCUMENT EMBEDDING (ingestion)
+# =====================================================
+class ParallelEmbedder:
+    """
+    Document embedder for ingestion. With workers > 1 it runs a
+    sentence-transformers multi-process pool (one CPU process per worker)
+    and splits every call across it; with one worker it encodes in-process.
+
+    Produces the same vectors as Chroma's SentenceTransformerEmbeddingFunction
+    for the same model, so the output can go straight into
+    collection.add(embeddings=...). The model and pool are only started on
+    the first call (a fully cached re-index never needs them). Use as a
+    context manager so the pool is shut down.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, workers: int = EMBED_WORKERS,
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.model = None
+        self.pool = None
+
+    @property
+    def cache_name(self) -> str:
+        return self.model_name
+
+    def _start(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        if self.workers > 1:
+            self.pool = self._start_pool()
+
+    def _start_pool(self):
+        # split the cores between the (spawned) workers instead of every
+        # worker's torch grabbing all of them
+        threads = str(max(1, (os.cpu_count() or 1) // self.workers))
+        previous = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = threads
+        try:
+            return self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        finally:
+            if previous is None:
+                del os.environ["OMP_NUM_THREADS"]
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+
+    def __call__(self, documents) -> np.ndarray:
+        documents = list(documents)
+        if self.model is None:
+            self._start()
+        if not documents:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        if self.pool is None:
+            return self.model.encode(documents, batch_size=self.batch_size, convert_to_numpy=True)
+
+        # one slice per worker (at least one batch each) keeps every process busy
+        chunk_size = max(self.batch_size, -(-len(documents) // self.workers))
+        return self.model.encode_multi_process(
+            documents, self.pool, batch_size=self.batch_size, chunk_size=chunk_size
+        )
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =====================================================
+# ONNX RUNTIME BACKEND (no torch at runtime)
+# =====================================================
+class OnnxEmbedder:
+    """
+    The same sentence-transformers model run through ONNX Runtime, by
+    default with int8 dynamic quantization, from files written by
+    export_onnx.py: tokenizer.json, model.onnx / model.int8.onnx, meta.json.
+
+    Reproduces the sentence-transformers pipeline (truncate to
+    max_seq_length, mean pooling over the attention mask, L2 normalize)
+    with only onnxruntime, tokenizers and numpy imported.
+    """
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = ONNX_QUANTIZED,
+                 batch_size: int = EMBED_BATCH_SIZE, threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.model_name = meta["model"]
+        self.normalize = meta["normalize"]
+        self.quantized = quantized
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=meta["pad_id"], pad_token=meta["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @property
+    def cache_name(self) -> str:
+        # quantized vectors differ slightly; keep them apart in the embedding cache
+        return f"{self.model_name}@onnx{'-int8' if self.quantized else ''}"
+
+    def __call__(self, documents) -> np.ndarray:
+        documents = list(documents)
+        out = [self._embed_batch(documents[i:i + self.batch_size])
+               for i in range(0, len(documents), self.batch_size)]
+        if not out:
+            dim = self.session.get_outputs()[0].shape[-1]
+            return np.zeros((0, dim if isinstance(dim, int) else 0), dtype=np.float32)
+        return np.concatenate(out)
+
+    def _embed_batch(self, documents) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(documents)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def make_embedder(backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL,
+                  workers: int = EMBED_WORKERS, batch_size: int = EMBED_BATCH_SIZE):
+    """Embedder for the configured backend: "torch" (sentence-transformers) or "onnx"."""
+    if backend == "torch":
+        return ParallelEmbedder(model_name, workers, batch_size)
+    if backend == "onnx":
+        # ONNX Runtime already spreads one batch over all cores
+        embedder = OnnxEmbedder(batch_size=batch_size)
+        if embedder.model_name != model_name:
+            raise ValueError(f"{ONNX_MODEL_DIR} was exported from {embedder.model_name}, not {model_name}")
+        return embedder
+    raise ValueError(f"Unknown embedding backend: {backend} (expected torch or onnx)")
@@ -0,0 +1,245 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+QUERY_CACHE_ENTRIES = int(os.getenv("QUERY_CACHE_ENTRIES", "20000"))
+
+KEY_BYTES = 20  # sha1 digest
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+# =====================================================
+# ON-DISK EMBEDDING CACHE
+# =====================================================
+class EmbeddingCache:
+    """
+    (model name, sha1 of text) -> float32 vector for catalog documents,
+    shared by ingestion runs. One directory per model:
+
+      vectors.f32   append-only float32 rows, memory-mapped for reads
+      keys.bin      append-only sha1 digests, row i <-> key i
+      meta.json     model name and dimension
+
+    The hash index ({digest: row}) is rebuilt from keys.bin on open.
+    Appends take an exclusive file lock and first pick up rows written by
+    other processes, so an ingestion run and a server can share the cache;
+    a torn append (vector without key) is cut off by the next writer.
+    """
+
+    def __init__(self, model_name: str, root: str = EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.meta_path = os.path.join(self.path, "meta.json")
+
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self.count = 0
+        self.index = {}
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["model"] != model_name:
+                raise ValueError(f"{self.path} holds embeddings for {meta['model']}, not {model_name}")
+            self.dim = meta["dim"]
+            self._catch_up()
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def embed(self, texts, compute) -> np.ndarray:
+        """
+        Vectors for `texts` in order; only texts not cached yet go through
+        `compute` (list[str] -> array-like of vectors), and those are stored.
+        """
+        texts = list(texts)
+        keys = [text_key(t) for t in texts]
+
+        with self._lock:
+            rows = [self.index.get(k) for k in keys]
+            if None in rows:
+                self._catch_up()
+                rows = [self.index.get(k) for k in keys]
+
+        missing = {}
+        for key, text, row in zip(keys, texts, rows):
+            if row is None:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - sum(row is None for row in rows)
+        self.misses += len(missing)
+
+        computed = {}
+        if missing:
+            vectors = np.asarray(compute(list(missing.values())), dtype=np.float32)
+            computed = dict(zip(missing, vectors))
+            self._append(list(missing), vectors)
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        cached = [i for i, row in enumerate(rows) if row is not None]
+        if cached:
+            with self._lock:
+                out[cached] = self._mapped()[[rows[i] for i in cached]]
+        for i, (key, row) in enumerate(zip(keys, rows)):
+            if row is None:
+                out[i] = computed[key]
+        return out
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def _mapped(self):
+        if self._vectors is None or len(self._vectors) != self.count:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self.count, self.dim))
+        return self._vectors
+
+    def _stored_rows(self) -> int:
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return 0
+        return min(
+            os.path.getsize(self.keys_path) // KEY_BYTES,
+            os.path.getsize(self.vectors_path) // (4 * self.dim),
+        )
+
+    def _catch_up(self):
+        # index rows appended since we last looked (possibly by another process)
+        stored = self._stored_rows()
+        if stored <= self.count:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self.count * KEY_BYTES)
+            data = f.read((stored - self.count) * KEY_BYTES)
+        for i in range(stored - self.count):
+            self.index.setdefault(data[i * KEY_BYTES:(i + 1) * KEY_BYTES], self.count + i)
+        self.count = stored
+
+    def _append(self, keys, vectors):
+        with self._lock, open(os.path.join(self.path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+            self._catch_up()
+
+            fresh = [i for i, key in enumerate(keys) if key not in self.index]
+            if not fresh:
+                return
+
+            # vectors first, keys last: a row only counts once its key is written
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(self.count * 4 * self.dim)
+                f.write(np.ascontiguousarray(vectors[fresh], dtype=np.float32).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(self.count * KEY_BYTES)
+                f.write(b"".join(keys[i] for i in fresh))
+
+            for offset, i in enumerate(fresh):
+                self.index[keys[i]] = self.count + offset
+            self.count += len(fresh)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# =====================================================
+# IN-MEMORY QUERY EMBEDDING CACHE
+# =====================================================
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of query vectors, per process. Query text is open-ended,
+    so it stays out of the append-only on-disk cache, which only grows
+    with the catalog.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, texts, compute) -> np.ndarray:
+        texts = list(texts)
+        with self._lock:
+            found = {}
+            for text in texts:
+                vector = self._vectors.get(text)
+                if vector is not None:
+                    self._vectors.move_to_end(text)
+                    found[text] = vector
+            missing = list(dict.fromkeys(t for t in texts if t not in found))
+            self.hits += len(texts) - sum(t not in found for t in texts)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = np.asarray(compute(missing), dtype=np.float32)
+            with self._lock:
+                for text, vector in zip(missing, vectors):
+                    found[text] = self._vectors[text] = vector
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[t] for t in texts])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._vectors),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def cached(compute, cache):
+    """`compute` (list[str] -> vectors) served through `cache`, or as-is without one."""
+    if cache is None:
+        return compute
+    return lambda texts: cache.embed(texts, compute)
+
+
+_shared_caches = {}
+
+
+def get_embedding_cache(model_name: str):
+    """The process-wide cache for `model_name`, or None when disabled with EMBEDDING_CACHE=0."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if model_name not in _shared_caches:
+        _shared_caches[model_name] = EmbeddingCache(model_name)
+    return _shared_caches[model_name]
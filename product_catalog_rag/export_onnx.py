@@ -0,0 +1,83 @@
+"""
+Export the sentence-transformers embedding model to ONNX and quantize it
+to int8 for the "onnx" embedding backend (EMBEDDING_BACKEND=onnx).
+
+    python export_onnx.py                       # -> models/all-MiniLM-L6-v2-onnx/
+    python export_onnx.py --out some/dir --opset 17
+
+Needs torch, sentence-transformers and onnxruntime once, at export time;
+serving with the exported files only needs onnxruntime and tokenizers.
+"""
+import argparse
+import json
+import os
+
+from embedder import EMBEDDING_MODEL, ONNX_MODEL_DIR
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL, out_dir: str = ONNX_MODEL_DIR, opset: int = 17):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    pooling = next(m for m in st_model if isinstance(m, Pooling))
+    if pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"Only mean pooling is supported, {model_name} uses {pooling.get_pooling_mode_str()}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+
+    # ---- Transformer -> ONNX (pooling / normalization stay in numpy) ----
+    tokenizer = transformer.tokenizer
+    model = transformer.auto_model.eval()
+    model.config.return_dict = False
+    sample = tokenizer(["USB-C docking station", "industrial PoE switch 8 port"],
+                       padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    # ---- int8 dynamic quantization (weights int8, activations quantized at runtime) ----
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model": model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "normalize": any(isinstance(m, Normalize) for m in st_model),
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+        }, f, indent=2)
+
+    for path in (fp32_path, int8_path):
+        print(f"{path}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    export_onnx(args.model, args.out, args.opset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import os
+import weakref
+
+import numpy as np
+
+from bm25_index import id_array, id_positions, tokenize
+from index_store import load_or_build as _load_or_build, write_dir
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+FACET_DIR = "facet_index"
+FACETS = ("category", "brand", "status")  # metadata fields that can be filtered on
+INFER_FACETS = ("category", "brand")      # never inferred: status
+MAX_CACHED_MASKS = 256
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _words(text: str) -> list:
+    return [_singular(t) for t in tokenize(str(text)) if t.isalpha()]
+
+
+def normalize_filters(filters) -> dict:
+    """
+    {facet: value or [values]} -> {facet: (values, ...)}; facets are AND-ed,
+    values of one facet OR-ed. Empty values drop the facet.
+    """
+    normalized = {}
+    for facet, values in (filters or {}).items():
+        if facet not in FACETS:
+            raise ValueError(f"Unknown filter facet: {facet} (expected one of {', '.join(FACETS)})")
+        if isinstance(values, str):
+            values = [values]
+        values = tuple(sorted({str(v) for v in values if str(v).strip()}))
+        if values:
+            normalized[facet] = values
+    return normalized
+
+
+def chroma_where(filters: dict):
+    """Chroma `where=` clause for normalized filters (None when unfiltered)."""
+    clauses = [
+        {facet: values[0]} if len(values) == 1 else {facet: {"$in": list(values)}}
+        for facet, values in sorted(filters.items())
+    ]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+# =====================================================
+# FACET INDEX
+# =====================================================
+class FacetIndex:
+    """
+    Category / brand / lifecycle status of every product as columns of
+    value codes, built at ingest time. A filter becomes a document bitmap
+    (np.packbits over BM25 positions), computed once per distinct filter
+    and cached, so BM25 only scores documents that pass it.
+
+    On disk: doc_ids.npy, doc_order.npy, <facet>_values.npy, <facet>_codes.npy.
+    """
+
+    def __init__(self, doc_ids, values: dict, codes: dict, doc_order=None):
+        self.doc_ids = doc_ids
+        self.values = values
+        self.codes = codes
+        self.doc_order = (
+            doc_order if doc_order is not None
+            else np.argsort(doc_ids, kind="stable").astype(np.int32)
+        )
+        # lowercase value -> stored value, so filters are case-insensitive
+        self._canonical = {
+            facet: {str(v).lower(): str(v) for v in self.values[facet].tolist()}
+            for facet in FACETS
+        }
+        self._infer_words = {
+            facet: [(str(v), set(_words(v)), _words(v)[-1]) for v in self.values[facet].tolist() if _words(v)]
+            for facet in INFER_FACETS
+        }
+        # BM25 index -> {filters: bitmap}; entries go with the index after a reload
+        self._masks = weakref.WeakKeyDictionary()
+
+    # -----------------------------
+    # Filters
+    # -----------------------------
+    def resolve(self, filters) -> dict:
+        """Normalized filters with values spelled as in the catalog."""
+        return {
+            facet: tuple(sorted({self._canonical[facet].get(v.lower(), v) for v in values}))
+            for facet, values in normalize_filters(filters).items()
+        }
+
+    def infer(self, query: str) -> dict:
+        """
+        Filters implied by the query: a brand named anywhere in it, and a
+        category whose last word is the query's head noun (its last word),
+        so "CPU cooler" does not become a CPU filter.
+        """
+        words = _words(query)
+        if not words:
+            return {}
+        present = set(words)
+        inferred = {}
+        for facet, options in self._infer_words.items():
+            matched = [
+                value for value, value_words, last in options
+                if value_words <= present and (facet != "category" or last == words[-1])
+            ]
+            if matched:
+                inferred[facet] = tuple(sorted(matched))
+        return inferred
+
+    def mask(self, filters: dict) -> np.ndarray:
+        """Boolean mask over this index's documents for resolved filters."""
+        mask = np.ones(len(self.doc_ids), dtype=bool)
+        for facet, values in filters.items():
+            wanted = np.flatnonzero(np.isin(self.values[facet], values))
+            mask &= np.isin(self.codes[facet], wanted)
+        return mask
+
+    def allows(self, ids, filters: dict) -> np.ndarray:
+        """Which of the Chroma `ids` pass the resolved filters."""
+        pos = id_positions(self.doc_ids, self.doc_order, ids)
+        allowed = self.mask(filters)
+        return (pos >= 0) & allowed[np.maximum(pos, 0)]
+
+    def bm25_bitmap(self, bm25_index, filters: dict) -> np.ndarray:
+        """Packed bitmap over `bm25_index` document positions; cached per filter."""
+        masks = self._masks.setdefault(bm25_index, {})
+        key = tuple(sorted(filters.items()))
+        bitmap = masks.get(key)
+        if bitmap is None:
+            bits = np.zeros(bm25_index.num_docs, dtype=bool)
+            pos = bm25_index.positions(self.doc_ids[self.mask(filters)])
+            bits[pos[pos >= 0]] = True
+            bitmap = np.packbits(bits)
+            if len(masks) >= MAX_CACHED_MASKS:
+                masks.clear()
+            masks[key] = bitmap
+        return bitmap
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _arrays(self):
+        yield "doc_ids", self.doc_ids
+        yield "doc_order", self.doc_order
+        for facet in FACETS:
+            yield f"{facet}_values", self.values[facet]
+            yield f"{facet}_codes", self.codes[facet]
+
+    def save(self, path: str = FACET_DIR):
+        """Write to the new directory `path` (see index_store.write_dir)."""
+        write_dir(path, self._write)
+
+    def _write(self, path: str):
+        for name, values in self._arrays():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+
+    @classmethod
+    def load(cls, path: str = FACET_DIR, mmap: bool = True):
+        mode = "r" if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+
+        return cls(
+            array("doc_ids"),
+            {facet: array(f"{facet}_values") for facet in FACETS},
+            {facet: array(f"{facet}_codes") for facet in FACETS},
+            array("doc_order"),
+        )
+
+
+class FacetBuilder:
+    """Collects facet values while a catalog is streamed."""
+
+    def __init__(self):
+        self.ids = []
+        self.value_codes = {facet: {} for facet in FACETS}
+        self.codes = {facet: [] for facet in FACETS}
+
+    def add(self, doc_id, metadata: dict):
+        self.ids.append(str(doc_id))
+        for facet in FACETS:
+            codes = self.value_codes[facet]
+            self.codes[facet].append(codes.setdefault(str(metadata.get(facet, "")), len(codes)))
+
+    def build(self) -> FacetIndex:
+        values = {
+            facet: id_array(sorted(codes, key=codes.get))
+            for facet, codes in self.value_codes.items()
+        }
+        codes = {facet: np.array(c, dtype=np.int32) for facet, c in self.codes.items()}
+        return FacetIndex(id_array(self.ids), values, codes)
+
+
+def build_from_collection(collection, batch_size: int = 5000) -> FacetIndex:
+    """Build from the metadata of an existing Chroma collection."""
+    builder = FacetBuilder()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        for doc_id, meta in zip(page["ids"], page["metadatas"]):
+            builder.add(doc_id, meta)
+    return builder.build()
+
+
+def load_or_build(collection, path: str = FACET_DIR) -> FacetIndex:
+    return _load_or_build(path, FacetIndex.load, lambda: build_from_collection(collection), marker="doc_ids.npy")
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+from http import HTTPStatus
+
+from http_server import start_json_server
+from llm_stub import stub_llm
+
+# =====================================================
+# FAKE OPENAI-COMPATIBLE LLM SERVER
+# =====================================================
+# Serves POST /chat/completions with llm_stub answers, so the real HTTP
+# client path (pooling, timeouts, retries) can be exercised offline:
+#
+#   python fake_llm_server.py --port 8765 &
+#   LLM_BASE_URL=http://127.0.0.1:8765 python server.py
+#
+# --fail-every N answers every Nth request with 503 to exercise retries.
+# Requests with "stream": true are answered as server-sent events.
+
+HOST = "127.0.0.1"
+PORT = 8765
+STREAM_CHUNK = 16  # characters per server-sent event
+
+
+class FakeLLM:
+    def __init__(self, delay: float = 0.0, fail_every: int = 0):
+        self.delay = delay
+        self.fail_every = fail_every
+        self.requests = 0
+
+    async def handle(self, method: str, path: str, body: bytes):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}
+
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "injected failure"}
+
+        request = json.loads(body)
+        prompt = request["messages"][-1]["content"]
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if request.get("stream"):
+            return HTTPStatus.OK, self._events(stub_llm(prompt))
+
+        return HTTPStatus.OK, {
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": stub_llm(prompt)},
+                "finish_reason": "stop"
+            }]
+        }
+
+    async def _events(self, text: str):
+        for i in range(0, len(text), STREAM_CHUNK):
+            delta = {"choices": [{"index": 0, "delta": {"content": text[i:i + STREAM_CHUNK]}}]}
+            yield f"data: {json.dumps(delta)}\n\n"
+            await asyncio.sleep(0)
+        yield "data: [DONE]\n\n"
+
+
+async def serve(fake: FakeLLM, host: str = HOST, port: int = PORT):
+    server = await start_json_server(fake.handle, host, port)
+    print(f"Fake LLM serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM for offline tests")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait per request")
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(serve(FakeLLM(args.delay, args.fail_every), args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
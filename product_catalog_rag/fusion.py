@@ -0,0 +1,85 @@
+import numpy as np
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+ALPHA = 0.5   # semantic
+BETA = 0.3    # keyword
+GAMMA = 0.2   # numeric identity
+RRF_K = 60
+
+
+# =====================================================
+# SCORE FUSION
+# =====================================================
+# Every method takes parallel arrays (one entry per candidate) and returns
+# one hybrid score per candidate; higher is better. `vector_hit` marks the
+# candidates the vector search returned (others carry a placeholder distance).
+
+def min_max(xs: np.ndarray) -> np.ndarray:
+    # constant inputs are returned unchanged, as the original list version did
+    if not len(xs):
+        return xs
+    lo, hi = xs.min(), xs.max()
+    if hi == lo:
+        return xs
+    return (xs - lo) / (hi - lo)
+
+
+def weighted_fusion(distance, bm25, numeric_match, vector_hit):
+    return (
+        ALPHA * min_max(1 - distance) +
+        BETA * min_max(bm25) +
+        GAMMA * numeric_match
+    )
+
+
+def rrf_fusion(distance, bm25, numeric_match, vector_hit):
+    """Reciprocal rank fusion; a candidate only ranks in channels that found it."""
+    scores = np.zeros(len(distance), dtype=np.float64)
+    channels = (
+        (1 - distance, vector_hit),
+        (bm25, bm25 > 0),
+        (numeric_match, numeric_match > 0),
+    )
+    for values, present in channels:
+        order = np.argsort(-values, kind="stable")
+        ranks = np.empty(len(values), dtype=np.int64)
+        ranks[order] = np.arange(1, len(values) + 1)
+        scores += np.where(present, 1.0 / (RRF_K + ranks), 0.0)
+    return scores
+
+
+FUSION_METHODS = {
+    "weighted": weighted_fusion,
+    "rrf": rrf_fusion,
+}
+
+
+def fuse(distance, bm25, numeric_match, method: str = "weighted", vector_hit=None) -> np.ndarray:
+    """`vector_hit` defaults to every candidate having come from the vector search."""
+    distance = np.asarray(distance, dtype=np.float64)
+    vector_hit = np.ones(len(distance), dtype=bool) if vector_hit is None else np.asarray(vector_hit, dtype=bool)
+    return FUSION_METHODS[method](
+        distance,
+        np.asarray(bm25, dtype=np.float64),
+        np.asarray(numeric_match, dtype=np.float64),
+        vector_hit,
+    )
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k best scores, best first. Ties keep input order, so the
+    result matches sorted(..., reverse=True)[:k] exactly.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    kth = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    top = np.concatenate([above, tied])
+    return top[np.lexsort((top, -scores[top]))]
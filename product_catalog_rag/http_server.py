@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1_000_000
+
+
+# =====================================================
+# MINIMAL ASYNCIO HTTP/1.1 JSON SERVER
+# =====================================================
+# `handler(method, path, body) -> (HTTPStatus, dict)` is awaited once per
+# connection; responses are JSON and the connection is closed afterwards.
+# A handler may return an async iterator of str instead of a dict, which
+# is sent as text/event-stream until the iterator ends.
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    method, target, _ = request_line.split(" ", 2)
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], body
+
+
+def _write_response(writer, status: HTTPStatus, payload: dict):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def _write_stream(writer, status: HTTPStatus, chunks):
+    # no Content-Length: the closed connection ends the body
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: text/event-stream\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1"))
+    async for chunk in chunks:
+        writer.write(chunk.encode("utf-8"))
+        await writer.drain()
+
+
+async def _serve_connection(handler, reader, writer):
+    try:
+        try:
+            request = await _read_request(reader)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            _write_response(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        if request is None:
+            return
+
+        try:
+            status, payload = await handler(*request)
+        except Exception as e:
+            logger.exception("Request failed")
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+        if hasattr(payload, "__aiter__"):
+            await _write_stream(writer, status, payload)
+        else:
+            _write_response(writer, status, payload)
+    finally:
+        await writer.drain()
+        writer.close()
+
+
+async def start_json_server(handler, host: str, port: int):
+    return await asyncio.start_server(
+        lambda r, w: _serve_connection(handler, r, w), host, port
+    )
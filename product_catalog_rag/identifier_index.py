@@ -0,0 +1,231 @@
+import json
+import os
+import re
+from array import array
+
+import numpy as np
+
+from bm25_index import id_array, id_positions
+from index_store import load_or_build as _load_or_build, write_dir
+from normalizer import edit_distance
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+IDENT_DIR = "ident_index"
+IDENT_FORMAT = 2  # bumped when the key layout changes; older indexes are rebuilt
+EXACT_WEIGHT = 1.0  # the whole code, separators aside: GX850 == GX-850
+PART_WEIGHT = 0.7   # one part of a code: i7-13700 vs i7-13700K share "13700"
+PREFIX_WEIGHT = 0.6
+FUZZY_WEIGHT = 0.5
+NUMBER_WEIGHT = 0.4  # a bare digit run such as "850" says little about the model
+MIN_PREFIX_LEN = 3
+MIN_FUZZY_LEN = 4
+MIN_NUMBER_LEN = 2  # digit runs inside codes; "i7" must not index "7"
+MAX_RECALL_POSTINGS = 50  # keys shared by more products only boost, never recall
+MAX_PREFIX_KEYS = 200
+
+# a token with at least one digit: GX-850, i7-13700K, 32GB, RTX4080, 850
+_CODE = re.compile(r"(?=[A-Za-z0-9./_-]*\d)[A-Za-z0-9]+(?:[-/._][A-Za-z0-9]+)*")
+_SEP = re.compile(r"[-/._]")
+_DIGITS = re.compile(r"\d+")
+PART = "~"  # prefix of part / number keys; sorts after every full code
+
+
+def extract_identifiers(text: str) -> set:
+    """
+    Normalized identifier keys in `text`: every code with its separators
+    removed ("GX-850" -> "gx850") and, under the PART prefix, each part of
+    it that has a digit ("i7-13700K" -> "~i7", "~13700k") and every digit
+    run of at least MIN_NUMBER_LEN digits ("~850", "~13700"). A code made
+    of digits only is a number, not a full code.
+    """
+    keys = set()
+    for code in _CODE.findall(str(text)):
+        code = code.lower()
+        full = _SEP.sub("", code)
+        if not full.isdigit():
+            keys.add(full)
+        keys.update(PART + p for p in _SEP.split(code) if any(ch.isdigit() for ch in p))
+        keys.update(PART + d for d in _DIGITS.findall(code) if len(d) >= MIN_NUMBER_LEN)
+    return keys
+
+
+# =====================================================
+# IDENTIFIER INDEX
+# =====================================================
+class IdentifierIndex:
+    """
+    Model codes, SKUs and numbers from Product_Name / Product_ID -> products,
+    built at ingest time. Keys are a sorted array with CSR postings of doc
+    positions, so exact and prefix lookups are binary searches and fuzzy
+    lookups only compare keys that share the first two characters.
+
+    On disk: keys.npy, indptr.npy, postings.npy, doc_ids.npy, doc_order.npy
+    and meta.json ({"format": IDENT_FORMAT}).
+    """
+
+    def __init__(self, keys, indptr, postings, doc_ids, doc_order=None):
+        self.keys = keys
+        self.indptr = indptr
+        self.postings = postings
+        self.doc_ids = doc_ids
+        self.doc_order = (
+            doc_order if doc_order is not None
+            else np.argsort(doc_ids, kind="stable").astype(np.int32)
+        )
+
+    @classmethod
+    def build(cls, rows):
+        """rows: (chroma id, product id, product name)."""
+        builder = IdentifierBuilder()
+        for doc_id, product_id, product_name in rows:
+            builder.add(doc_id, product_id, product_name)
+        return builder.build()
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def _range(self, lo: str, hi: str):
+        return (
+            int(np.searchsorted(self.keys, lo, side="left")),
+            int(np.searchsorted(self.keys, hi, side="left")),
+        )
+
+    def _postings(self, row: int) -> np.ndarray:
+        return self.postings[self.indptr[row]:self.indptr[row + 1]]
+
+    def match(self, query: str) -> list:
+        """
+        [(weight, doc positions)] for every key hit of the identifiers in
+        `query`. Only a full code found as is scores EXACT_WEIGHT; parts and
+        digit runs match exactly at PART_WEIGHT / NUMBER_WEIGHT, and full
+        codes fall back to prefix and fuzzy matches of other full codes.
+        Cost depends on the query, not on the number of retrieved candidates.
+        """
+        hits = []
+        for key in extract_identifiers(query):
+            row = int(np.searchsorted(self.keys, key))
+            found = row < len(self.keys) and self.keys[row] == key
+            if key.startswith(PART):
+                if found:
+                    weight = NUMBER_WEIGHT if key[1:].isdigit() else PART_WEIGHT
+                    hits.append((weight, self._postings(row)))
+                continue
+            if found:
+                hits.append((EXACT_WEIGHT, self._postings(row)))
+                continue
+
+            if len(key) >= MIN_PREFIX_LEN:
+                start, end = self._range(key, key + "\uffff")
+                if 0 < end - start <= MAX_PREFIX_KEYS:
+                    hits.extend((PREFIX_WEIGHT, self._postings(row)) for row in range(start, end))
+                    continue
+
+            if len(key) >= MIN_FUZZY_LEN:
+                start, end = self._range(key[:2], key[:2] + "\uffff")
+                for row in range(start, end):
+                    other = str(self.keys[row])
+                    if abs(len(other) - len(key)) <= 1 and edit_distance(key, other, limit=1) <= 1:
+                        hits.append((FUZZY_WEIGHT, self._postings(row)))
+        return hits
+
+    def recall(self, hits, limit: int) -> list:
+        """Chroma ids of the best `limit` products hit by specific keys."""
+        best = {}
+        for weight, docs in hits:
+            if len(docs) > MAX_RECALL_POSTINGS:
+                continue
+            for pos in docs.tolist():
+                if weight > best.get(pos, 0.0):
+                    best[pos] = weight
+        top = sorted(best.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [(str(self.doc_ids[pos]), weight) for pos, weight in top]
+
+    def scores(self, hits, ids) -> np.ndarray:
+        """Best identifier weight for each of the Chroma `ids` (0 when none)."""
+        pos = id_positions(self.doc_ids, self.doc_order, ids)
+        scores = np.zeros(len(pos), dtype=np.float64)
+        known = pos >= 0
+        for weight, docs in hits:
+            if not len(docs):
+                continue
+            rows = np.minimum(np.searchsorted(docs, pos), len(docs) - 1)
+            hit = known & (docs[rows] == pos)
+            scores[hit] = np.maximum(scores[hit], weight)
+        return scores
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: str = IDENT_DIR):
+        """Write to the new directory `path` (see index_store.write_dir)."""
+        write_dir(path, self._write)
+
+    def _write(self, path: str):
+        for name in ("keys", "indptr", "postings", "doc_ids", "doc_order"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": IDENT_FORMAT}, f)
+
+    @classmethod
+    def load(cls, path: str = IDENT_DIR, mmap: bool = True):
+        mode = "r" if mmap else None
+        return cls(*(
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in ("keys", "indptr", "postings", "doc_ids", "doc_order")
+        ))
+
+
+class IdentifierBuilder:
+    """Collects (key, doc position) pairs while a catalog is streamed."""
+
+    def __init__(self):
+        self.ids = []
+        self.key_ids = {}
+        self.pair_keys = array("i")
+        self.pair_docs = array("i")
+
+    def add(self, doc_id, product_id, product_name):
+        pos = len(self.ids)
+        self.ids.append(str(doc_id))
+        for key in extract_identifiers(f"{product_id} {product_name}"):
+            kid = self.key_ids.setdefault(key, len(self.key_ids))
+            self.pair_keys.append(kid)
+            self.pair_docs.append(pos)
+
+    def build(self) -> IdentifierIndex:
+        keys = id_array(sorted(self.key_ids))
+        rank = np.empty(len(self.key_ids), dtype=np.int32)
+        rank[[self.key_ids[k] for k in keys.tolist()]] = np.arange(len(keys), dtype=np.int32)
+
+        pair_keys = rank[np.frombuffer(self.pair_keys, dtype=np.int32)]
+        pair_docs = np.frombuffer(self.pair_docs, dtype=np.int32)
+        order = np.lexsort((pair_docs, pair_keys))  # postings sorted by doc position
+
+        counts = np.bincount(pair_keys, minlength=len(keys))
+        indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return IdentifierIndex(keys, indptr, pair_docs[order], id_array(self.ids))
+
+
+def build_from_collection(collection, batch_size: int = 5000) -> IdentifierIndex:
+    """Build from the metadata of an existing Chroma collection."""
+    builder = IdentifierBuilder()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        for doc_id, meta in zip(page["ids"], page["metadatas"]):
+            builder.add(doc_id, meta["product_id"], meta["product_name"])
+    return builder.build()
+
+
+def _current(path: str) -> bool:
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return json.load(f).get("format") == IDENT_FORMAT
+    except FileNotFoundError:
+        return False
+
+
+def load_or_build(collection, path: str = IDENT_DIR) -> IdentifierIndex:
+    return _load_or_build(path, IdentifierIndex.load, lambda: build_from_collection(collection), current=_current)
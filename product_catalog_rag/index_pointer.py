@@ -0,0 +1,72 @@
+import json
+import os
+import re
+import time
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+POINTER_PATH = os.getenv("INDEX_POINTER_PATH", "active_index.json")
+KEEP_VERSIONS = 2  # active + previous, so in-flight readers finish on the old one
+
+
+# =====================================================
+# ACTIVE INDEX POINTER
+# =====================================================
+# Re-index builds a versioned Chroma collection (products_catalog__v42),
+# BM25 directory (bm25_index__v42), identifier index (ident_index__v42) and
+# facet index (facet_index__v42) next to the live ones, then repoints this
+# small JSON record with an atomic os.replace. Readers resolve the record
+# instead of a hard-coded collection name, and reload when it changes.
+#
+# {"version": 42, "revision": 3, "collection": "products_catalog__v42",
+#  "bm25_dir": "bm25_index__v42", "identifier_dir": "ident_index__v42",
+#  "facet_dir": "facet_index__v42", "embedding_model": "...", "updated": 1718...}
+#
+# `revision` is bumped by incremental syncs, which write their index deltas
+# into new directories of the same version (bm25_index__v42r3) and repoint
+# the record, so readers also pick up the new keyword, identifier and facet
+# indexes. A published directory is never modified (see index_store.py).
+
+def versioned_name(base: str, version: int, revision: int = 0) -> str:
+    return f"{base}__v{version}r{revision}" if revision else f"{base}__v{version}"
+
+
+def parse_name(name: str, base: str):
+    """(version, revision) of a versioned_name() of `base`, or None."""
+    match = re.fullmatch(re.escape(base) + r"__v(\d+)(?:r(\d+))?", name)
+    return (int(match.group(1)), int(match.group(2) or 0)) if match else None
+
+
+def parse_version(name: str, base: str):
+    parsed = parse_name(name, base)
+    return parsed[0] if parsed else None
+
+
+def read_pointer(path: str = POINTER_PATH):
+    """The active index record, or None before the first versioned build."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_pointer(record: dict, path: str = POINTER_PATH) -> dict:
+    record = dict(record, updated=time.time())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return record
+
+
+def pointer_stamp(path: str = POINTER_PATH):
+    """Cheap change check for readers: (mtime_ns, size), or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
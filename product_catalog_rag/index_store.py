@@ -0,0 +1,57 @@
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# INDEX DIRECTORIES
+# =====================================================
+# The BM25, identifier and facet indexes are directories of .npy / .json
+# files that readers memory-map. A directory is written once and never
+# changed afterwards: every build or sync writes a new one (named with
+# index_pointer.versioned_name) and then repoints the active index record,
+# so a reader is either still on the old directory or loads the new one
+# complete. Old directories are garbage-collected by add_data_to_db.
+
+
+def write_dir(path: str, write):
+    """
+    Create the index directory `path`: write(tmp_dir) fills a private
+    temporary directory, which is renamed to `path` once complete. Raises
+    FileExistsError if `path` already exists; it is never replaced.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        write(tmp_path)
+        os.rename(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if os.path.exists(path):
+            raise FileExistsError(path)  # another process published it first
+        raise
+
+
+def load_or_build(path: str, load, build, marker: str = "meta.json", current=None):
+    """
+    load(path) when `path` holds a usable index (its `marker` file exists,
+    or current(path) is true), else build() one and publish it at `path`.
+    An outdated directory already at `path` is left alone; the index built
+    from the collection is used from memory until the next re-index.
+    """
+    current = current or (lambda p: os.path.exists(os.path.join(p, marker)))
+    if current(path):
+        return load(path)
+
+    index = build()
+    try:
+        index.save(path)
+    except FileExistsError:
+        if not current(path):
+            logger.warning("Index at %s is outdated; using one rebuilt in memory until the next re-index", path)
+    return index
@@ -0,0 +1,85 @@
+import json
+
+# =====================================================
+# INCREMENTAL JSON ARRAY PARSER
+# =====================================================
+# The Stage 2 answer is a JSON array of selection records. Rather than one
+# json.loads over the finished completion, the parser is fed text chunks
+# as they stream in and hands out each top-level element as soon as its
+# closing bracket arrives. Every element is decoded on its own, so one
+# malformed record does not take the rest of the array with it.
+
+
+class JSONArrayParser:
+    """
+    Feed text chunks with feed(); each call returns the elements completed
+    by that chunk as (ok, value) pairs: (True, decoded value) or
+    (False, raw element text) when the element is not valid JSON.
+    Anything before the opening "[" (prose, a ``` fence) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.count = 0
+
+    def feed(self, chunk: str) -> list:
+        elements = []
+        for ch in chunk:
+            if self.finished:
+                break
+            if not self.started:
+                self.started = ch == "["
+                continue
+
+            if self.in_string:
+                self.buffer.append(ch)
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if self.depth == 0 and ch in ",]":
+                self._emit(elements)
+                self.finished = ch == "]"
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in "[{":
+                self.depth += 1
+            elif ch in "]}":
+                self.depth -= 1
+            self.buffer.append(ch)
+
+            if self.depth == 0 and ch == "}":
+                # an object is complete at its closing brace, before the ","
+                self._emit(elements)
+        return elements
+
+    def close(self) -> list:
+        """Elements left when the stream ends; a truncated last element comes back as (False, text)."""
+        elements = []
+        if not self.finished:
+            self._emit(elements)
+            self.finished = True
+        return elements
+
+    def _emit(self, elements: list):
+        raw = "".join(self.buffer).strip()
+        self.buffer = []
+        if not raw:
+            return
+        self.count += 1
+        try:
+            elements.append((True, json.loads(raw)))
+        except json.JSONDecodeError:
+            elements.append((False, raw))
+
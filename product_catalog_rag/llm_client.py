@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import random
+
+import httpx
+from dotenv import load_dotenv
+
+from llm_cache import cache_key, get_llm_cache
+from utils import LLM_BASE_URL, LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, LLM_TIMEOUT
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF = 0.5
+STUB_STREAM_CHUNK = 24  # characters per streamed chunk from the stub backend
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+# =====================================================
+# BACKENDS
+# =====================================================
+class OpenAICompatibleBackend:
+    """
+    Chat completions over a pooled keep-alive httpx.AsyncClient.
+    Groq by default; point LLM_BASE_URL at any OpenAI-compatible endpoint,
+    e.g. fake_llm_server.py for offline tests.
+    """
+
+    def __init__(self, base_url: str = LLM_BASE_URL, api_key: str = None,
+                 model: str = LLM_MODEL, temperature: float = LLM_TEMPERATURE,
+                 max_tokens: int = LLM_MAX_TOKENS, timeout: float = LLM_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONCURRENCY):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+        headers = {}
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def complete(self, prompt: str) -> str:
+        response = await self.http.post("/chat/completions", json={
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        })
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream(self, prompt: str):
+        """Completion text chunks from a server-sent-events stream."""
+        async with self.http.stream("POST", "/chat/completions", json={
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt}],
+        }) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class StubBackend:
+    """In-process stand-in (llm_stub.stub_llm), no network."""
+
+    model = "stub"
+    temperature = 0
+    max_tokens = LLM_MAX_TOKENS
+
+    async def complete(self, prompt: str) -> str:
+        from llm_stub import stub_llm
+        return stub_llm(prompt)
+
+    async def stream(self, prompt: str):
+        text = await self.complete(prompt)
+        for i in range(0, len(text), STUB_STREAM_CHUNK):
+            await asyncio.sleep(0)
+            yield text[i:i + STUB_STREAM_CHUNK]
+
+    async def aclose(self):
+        pass
+
+
+# =====================================================
+# CLIENT
+# =====================================================
+class AsyncLLMClient:
+    """
+    Bounded-concurrency LLM client with retry and exponential backoff, in
+    front of an optional content-addressed response cache (llm_cache.py).
+    Create once per process (see get_async_llm) and share.
+    """
+
+    def __init__(self, backend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES, backoff: float = LLM_BACKOFF,
+                 cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    async def complete(self, prompt: str, validate=None) -> str:
+        """
+        The response to `prompt`. When `validate` is given, a response is
+        only cached (or served from the cache) if validate(text) accepts
+        it, so a truncated or malformed answer is asked for again rather
+        than replayed.
+        """
+        if self.cache is None:
+            return await self._complete(prompt)
+
+        key = cache_key(prompt, self.backend.model, self.backend.temperature, self.backend.max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None and (validate is None or validate(cached)):
+            return cached
+
+        response = await self._complete(prompt)
+        if validate is None or validate(response):
+            self.cache.put(key, response)
+        return response
+
+    async def _complete(self, prompt: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    return await self.backend.complete(prompt)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise LLMError(f"LLM request failed: {e}") from e
+                delay = _retry_after(e.response) or self._delay(attempt)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"LLM request failed: {e}") from e
+                delay = self._delay(attempt)
+
+            logger.warning("LLM call failed (attempt %d), retrying in %.2fs", attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+    async def stream(self, prompt: str, validate=None):
+        """
+        complete() as an async iterator of text chunks. A cached response
+        arrives as one chunk; the full text is cached once the stream ends
+        and `validate` (if given) accepts it.
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(prompt, self.backend.model, self.backend.temperature, self.backend.max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None and (validate is None or validate(cached)):
+                yield cached
+                return
+
+        parts = []
+        async for chunk in self._stream(prompt):
+            parts.append(chunk)
+            yield chunk
+        text = "".join(parts)
+        if key is not None and (validate is None or validate(text)):
+            self.cache.put(key, text)
+
+    async def _stream(self, prompt: str):
+        # retried like _complete, but only until the first chunk is out:
+        # a restarted stream would repeat text the caller already has
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.semaphore:
+                    async for chunk in self.backend.stream(prompt):
+                        started = True
+                        yield chunk
+                return
+            except httpx.HTTPStatusError as e:
+                if started or e.response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise LLMError(f"LLM stream failed: {e}") from e
+                delay = _retry_after(e.response) or self._delay(attempt)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if started or attempt == self.max_retries:
+                    raise LLMError(f"LLM stream failed: {e}") from e
+                delay = self._delay(attempt)
+
+            logger.warning("LLM stream failed (attempt %d), retrying in %.2fs", attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return 0.0
+
+
+def make_backend(name: str):
+    if name == "stub":
+        return StubBackend()
+    if name == "groq":
+        return OpenAICompatibleBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+def new_async_llm(backend: str = None) -> AsyncLLMClient:
+    """A client of its own, for one asyncio.run(); the caller closes it."""
+    return AsyncLLMClient(make_backend(backend or os.getenv("LLM_BACKEND", "groq")), cache=get_llm_cache())
+
+
+_shared_client = None
+
+
+def get_async_llm(backend: str = None) -> AsyncLLMClient:
+    """The process-wide client; the first call decides the backend."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = new_async_llm(backend)
+    return _shared_client
+
+
+async def close_async_llm():
+    """Close the process-wide client; the next get_async_llm() makes a new one."""
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,52 @@
+import json
+import re
+
+# =====================================================
+# OFFLINE LLM STUB
+# =====================================================
+# Answers the two prompts from prompt_builder.py deterministically, without
+# a network call: normalization splits the input on commas / "and" / lines,
+# selection picks the top-ranked retrieved candidate for every query.
+
+_NORMALIZATION_INPUT = re.compile(r"Input variable:\n(.*?)\n\nYour task is to:", re.S)
+_QUERY_BLOCK = re.compile(
+    r'Query \d+:\nUser Query:\n"(.*?)"\n\nRetrieved Candidates:\n?(.*?)(?=\n\nQuery \d+:|\n\nReturn STRICT JSON)',
+    re.S,
+)
+_FIRST_CANDIDATE = re.compile(r"- Product ID: (.*)\n- Product Name: (.*)")
+# compact format: a table of "id | name | category | score | details" rows
+_COMPACT_QUERY_BLOCK = re.compile(
+    r'Query \d+: "(.*?)"\nid \| name \| [^\n]*\n?(.*?)(?=\n\nQuery \d+:|\n\nReturn STRICT JSON)',
+    re.S,
+)
+_FIRST_ROW = re.compile(r"^(.*?) \| (.*?) \|", re.M)
+
+
+def _stub_normalize(text: str) -> str:
+    parts = re.split(r",|\band\b|\n", text)
+    return "\n".join(p.strip(" .;") for p in parts if p.strip(" .;"))
+
+
+def _stub_select(prompt: str) -> str:
+    blocks = [(q, c, _FIRST_CANDIDATE) for q, c in _QUERY_BLOCK.findall(prompt)]
+    blocks += [(q, c, _FIRST_ROW) for q, c in _COMPACT_QUERY_BLOCK.findall(prompt)]
+
+    results = []
+    for query, candidates, first_candidate in blocks:
+        first = first_candidate.search(candidates)
+        results.append({
+            "input_query": query,
+            "selected_product_id": first.group(1).strip() if first else None,
+            "selected_product_name": first.group(2).strip() if first else None,
+            "confidence": "low",
+            "reason": "stub LLM: top retrieved candidate"
+        })
+    return json.dumps(results)
+
+
+def stub_llm(prompt: str, validate=None) -> str:
+    # validate only matters for cached backends (see utils.call_llm)
+    normalization = _NORMALIZATION_INPUT.search(prompt)
+    if normalization:
+        return _stub_normalize(normalization.group(1))
+    return _stub_select(prompt)
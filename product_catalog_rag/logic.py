@@ -1,217 +1,575 @@
-import chromadb
-from chromadb.utils import embedding_functions
-from rank_bm25 import BM25Okapi
-import re
+import asyncio
 import json
-import uuid
-
-from prompt_builder import (
-    build_llm_prompt_batch,
-    build_input_normalization_prompt
-)
-from utils import call_llm, pretty_print_batch_data
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_builder import build_input_normalization_prompt
+from prompt_planner import build_sharded_prompts
+from json_stream import JSONArrayParser
+from decision import PathMetrics, get_fast_path, selection_metrics
+from normalizer import MIN_CONFIDENCE, NORMALIZER_MODE
+from selection_cache import document_hash, get_selection_cache
+from utils import LLM_MAX_TOKENS, get_llm, pretty_print_batch_data
 
 # -----------------------------
 # CONFIG
 # -----------------------------
-CHROMA_DIR = "chroma_db"
-COLLECTION_NAME = "products_catalog"
 INPUT_FILE = "input.txt"
 OUTPUT_FILE = "output.txt"
 TOP_K = 10
-DEBUG_HYBRID = True
+SELECTION_WORKERS = int(os.getenv("SELECTION_WORKERS", "4"))  # concurrent shard calls for the sync LLM
+SELECTION_RETRIES = int(os.getenv("SELECTION_RETRIES", "1"))  # single-query retries per failed record
+SELECTION_KEYS = {"input_query", "selected_product_id"}  # required in every Stage 2 record
+PIPELINE_QUEUE_SIZE = 64  # bound on queries waiting between two pipeline stages
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "2"))
+RETRIEVAL_BATCH = 8
+SELECTION_BATCH = 8
+SELECTION_LINGER = 0.05  # seconds a partial selection micro-batch waits for more queries
 
-# -----------------------------
-# Embedding function
-# -----------------------------
-embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
-)
+logger = logging.getLogger(__name__)
 
-# -----------------------------
-# Chroma client
-# -----------------------------
-client = chromadb.PersistentClient(path=CHROMA_DIR)
+normalization_metrics = PathMetrics("local", "llm")
 
-collection = client.get_collection(
-    name=COLLECTION_NAME,
-    embedding_function=embedding_function
-)
 
-# -----------------------------
-# LOAD ALL DOCUMENTS (for BM25)
-# -----------------------------
-def tokenize(text: str):
-    return re.findall(r"\b\w+\b", text.lower())
+# =====================================================
+# STAGE 0: INPUT NORMALIZATION
+# =====================================================
+# mode "llm" always asks the LLM, "local" always uses the rule-based
+# normalizer, "auto" uses it and falls back to the LLM on low confidence.
 
-all_data = collection.get(include=["documents", "metadatas"])
+def _normalize_locally(raw_input_text: str, mode: str, normalizer):
+    if mode not in ("llm", "local", "auto"):
+        raise ValueError(f"Unknown normalizer mode: {mode}")
+    if mode == "llm" or normalizer is None:
+        return None
 
-documents = all_data["documents"]
-metadatas = all_data["metadatas"]
+    queries, confidence = normalizer.normalize(raw_input_text)
+    if mode == "local" or confidence >= MIN_CONFIDENCE:
+        normalization_metrics.record("local")
+        return queries
+    return None
 
-bm25_corpus = [tokenize(doc) for doc in documents]
-bm25 = BM25Okapi(bm25_corpus)
 
-# =====================================================
-# HYBRID RETRIEVAL
-# =====================================================
-def hybrid_retrieve(query: str, top_k: int = 10):
-    # ---- Vector recall ----
-    vector_results = collection.query(
-        query_texts=[query],
-        n_results=25,
-        include=["documents", "metadatas", "distances"]
-    )
+def normalize_input(raw_input_text: str, llm, mode: str = NORMALIZER_MODE, normalizer=None) -> list[str]:
+    queries = _normalize_locally(raw_input_text, mode, normalizer)
+    if queries is not None:
+        return queries
 
-    candidates = {}
-
-    for doc, meta, dist in zip(
-        vector_results["documents"][0],
-        vector_results["metadatas"][0],
-        vector_results["distances"][0]
-    ):
-        pid = meta["product_id"]
-        candidates[pid] = {
-            "product_id": pid,
-            "product_name": meta["product_name"],
-            "category": meta["category"],
-            "doc": doc,
-            "distance": dist,
-            "bm25": 0.0,
-            "numeric_match": 0
-        }
-
-    # ---- BM25 keyword ----
-    scores = bm25.get_scores(tokenize(query))
-    for idx, score in enumerate(scores):
-        if score <= 0:
-            continue
-
-        pid = metadatas[idx]["product_id"]
-        if pid not in candidates:
-            candidates[pid] = {
-                "product_id": pid,
-                "product_name": metadatas[idx]["product_name"],
-                "category": metadatas[idx]["category"],
-                "doc": documents[idx],
-                "distance": 1.0,
-                "bm25": score,
-                "numeric_match": 0
-            }
-        else:
-            candidates[pid]["bm25"] = score
-
-    # ---- Numeric identity boost ----
-    q_nums = set(re.findall(r"\d+", query))
-    for c in candidates.values():
-        name_nums = set(re.findall(r"\d+", c["product_name"]))
-        if q_nums & name_nums:
-            c["numeric_match"] = 1
-    
-
-    if DEBUG_HYBRID:
-        print("\n================ HYBRID DEBUG ================")
-        print(f"QUERY: {query}\n")
-
-        for c in candidates.values():
-            if c['product_name'] in ["Dynasty Max Server Components 345", "Spectra Max Server Components 218"]:
-                print(f"Product: {c['product_name']}")
-                print(f"  Distance        : {c['distance']:.4f}")
-                print(f"  Semantic score  : {1 - c['distance']:.4f}")
-                print(f"  BM25 score      : {c['bm25']:.4f}")
-                print(f"  Numeric match   : {c['numeric_match']}")
-                print()
-
-    # ---- Normalize & score ----
-    vec_scores = [1 - c["distance"] for c in candidates.values()]
-    bm25_scores = [c["bm25"] for c in candidates.values()]
-
-    def norm(xs):
-        if not xs or max(xs) == min(xs):
-            return xs
-        return [(x - min(xs)) / (max(xs) - min(xs)) for x in xs]
-
-    n_vec = norm(vec_scores)
-    n_bm25 = norm(bm25_scores)
-
-    if DEBUG_HYBRID:
-        print("---- Normalized Scores ----")
-        for c, v, b in zip(candidates.values(), n_vec, n_bm25):
-            if c['product_name'] in ["Dynasty Max Server Components 345", "Spectra Max Server Components 218"]:
-                print(f"{c['product_name']}")
-                print(f"  Normalized semantic : {v:.4f}")
-                print(f"  Normalized BM25     : {b:.4f}")
-                print(f"  Numeric match       : {c['numeric_match']}")
-                print()
-
-
-    for c, v, b in zip(candidates.values(), n_vec, n_bm25):
-        semantic_part = 0.5 * v
-        keyword_part = 0.3 * b
-        numeric_part = 0.2 * c["numeric_match"]
-
-        c["hybrid_score"] = semantic_part + keyword_part + numeric_part
-
-        if DEBUG_HYBRID:
-            # if c['product_name'] in ["Dynasty Max Server Components 345", "Spectra Max Server Components 218"]:
-            print(f"FINAL SCORE → {c['product_name']}")
-            print(f"  Semantic part (0.5 * {v:.4f}) = {semantic_part:.4f}")
-            print(f"  Keyword part  (0.3 * {b:.4f}) = {keyword_part:.4f}")
-            print(f"  Numeric part  (0.2 * {c['numeric_match']}) = {numeric_part:.4f}")
-            print(f"  HYBRID SCORE  = {c['hybrid_score']:.4f}")
-            print("--------------------------------------------")
-
-    return sorted(
-        candidates.values(),
-        key=lambda x: x["hybrid_score"],
-        reverse=True
-    )[:top_k]
+    normalization_metrics.record("llm")
+    normalization_prompt = build_input_normalization_prompt(raw_input_text)
+    normalized_result = llm(normalization_prompt, validate=_has_queries)
+
+    return _parse_normalized(normalized_result)
+
+
+async def normalize_input_async(raw_input_text: str, llm_client, mode: str = NORMALIZER_MODE,
+                                normalizer=None) -> list[str]:
+    queries = _normalize_locally(raw_input_text, mode, normalizer)
+    if queries is not None:
+        return queries
+
+    normalization_metrics.record("llm")
+    normalization_prompt = build_input_normalization_prompt(raw_input_text)
+    normalized_result = await llm_client.complete(normalization_prompt, validate=_has_queries)
+
+    return _parse_normalized(normalized_result)
 
-# =====================================================
-# STAGE 0: INPUT NORMALIZATION
-# =====================================================
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    raw_input_text = f.read().strip()
 
-normalization_prompt = build_input_normalization_prompt(raw_input_text)
-normalized_result = call_llm(normalization_prompt)
+def _parse_normalized(normalized_result: str) -> list[str]:
+    return [q.strip() for q in normalized_result.splitlines() if q.strip()]
+
+
+def _has_queries(normalized_result: str) -> bool:
+    # an empty normalization is not worth caching
+    return bool(_parse_normalized(normalized_result))
 
-queries = [q.strip() for q in normalized_result.splitlines() if q.strip()]
 
 # =====================================================
 # STAGE 1: HYBRID RETRIEVAL
 # =====================================================
-batch_data = []
-
-for query in queries:
-    results = hybrid_retrieve(query, TOP_K)
-
-    batch_data.append({
-        "query": query,
-        "candidates": [
-            {
-                "product_id": c["product_id"],
-                "product_name": c["product_name"],
-                "category": c["category"],
-                "distance": round(c["distance"], 4),
-                "hybrid_score": round(c["hybrid_score"], 4),
-                "description": c["doc"][:300]
-            }
-            for c in results
-        ]
-    })
-
-pretty_print_batch_data(batch_data)
+def retrieve_candidates(queries: list[str], retriever, top_k: int = TOP_K, filters: dict = None) -> list[dict]:
+    batch_data = []
+
+    for query, results in zip(queries, retriever.hybrid_retrieve_batch(queries, top_k, filters)):
+        batch_data.append({
+            "query": query,
+            "candidates": [
+                {
+                    "product_id": c["product_id"],
+                    "product_name": c["product_name"],
+                    "category": c["category"],
+                    "distance": round(c["distance"], 4),
+                    "hybrid_score": round(c["hybrid_score"], 4),
+                    "numeric_match": c["numeric_match"],
+                    "exact_identifier": c["exact_identifier"],
+                    "description": c["doc"][:300],
+                    "doc_hash": document_hash(c["doc"])
+                }
+                for c in results
+            ]
+        })
+
+    return batch_data
+
 
 # =====================================================
 # STAGE 2: LLM CANONICAL SELECTION
 # =====================================================
-selection_prompt = build_llm_prompt_batch(batch_data)
-llm_result = call_llm(selection_prompt)
+def _empty_selection(query: str, reason: str) -> dict:
+    return {
+        "input_query": query,
+        "selected_product_id": None,
+        "selected_product_name": None,
+        "confidence": "low",
+        "reason": reason
+    }
+
+
+def _resolve_without_llm(batch_data: list[dict], selection_cache, fast_path, on_result=None):
+    """
+    Resolve what the rule-based fast path and the selection cache can;
+    return (results, indices still needing the LLM).
+    """
+    results = [None] * len(batch_data)
+    misses = []
+
+    for i, item in enumerate(batch_data):
+        if fast_path is not None:
+            results[i] = fast_path.decide(item)
+            if results[i] is not None:
+                selection_metrics.record("rule")
+                continue
+
+        if selection_cache is not None:
+            results[i] = selection_cache.get(item)
+            if results[i] is not None:
+                selection_metrics.record("cache")
+                continue
+
+        misses.append(i)
+
+    if misses:
+        selection_metrics.record("llm", len(misses))
+    if on_result is not None:
+        for i, record in enumerate(results):
+            if record is not None:
+                on_result(i, record)
+    return results, misses
+
+
+class _ShardCollector:
+    """
+    Matches the elements of one shard's JSON answer to the shard's queries
+    while the answer is parsed: by input_query when it names an open query
+    of the shard, otherwise by position. A record is only accepted when it
+    has the selection keys and picks one of that query's candidates (or
+    none); queries still open at the end are retried on their own. With
+    no `accept`, it only checks an answer (see _answers_shard).
+    """
+
+    def __init__(self, batch_data: list[dict], shard: list[int], accept=None):
+        self.batch_data = batch_data
+        self.shard = shard
+        self.accept = accept
+        self.parser = JSONArrayParser()
+        self.open = set(shard)
+        self.seen = 0
+        self.by_query = {}
+        for i in shard:
+            self.by_query.setdefault(batch_data[i]["query"], []).append(i)
+
+    def feed(self, chunk: str):
+        self._take(self.parser.feed(chunk))
+
+    def close(self) -> list[int]:
+        self._take(self.parser.close())
+        return [i for i in self.shard if i in self.open]
+
+    def _take(self, elements):
+        for ok, record in elements:
+            position = self.seen
+            self.seen += 1
+            if not ok or not isinstance(record, dict) or not SELECTION_KEYS <= record.keys():
+                continue
+            i = self._claim(record["input_query"], position)
+            if i is None or not _selects_candidate(record, self.batch_data[i]):
+                if self.accept is not None:
+                    logger.warning("Discarding invalid selection record %r", record)
+                continue
+            self.open.discard(i)
+            if self.accept is not None:
+                self.accept(i, record)
+
+    def _claim(self, query, position: int):
+        for i in self.by_query.get(query, []):
+            if i in self.open:
+                return i
+        if position < len(self.shard) and self.shard[position] in self.open:
+            return self.shard[position]
+        return None
+
+
+def _selects_candidate(record: dict, item: dict) -> bool:
+    selected = record["selected_product_id"]
+    if selected is None:
+        return True
+    return str(selected) in {str(c["product_id"]) for c in item["candidates"]}
+
+
+def _answers_shard(batch_data: list[dict], shard: list[int]):
+    """validate= for a selection call: the answer resolves every query of the shard."""
+    def validate(text: str) -> bool:
+        collector = _ShardCollector(batch_data, shard)
+        collector.feed(text)
+        return not collector.close()
+    return validate
+
+
+def _acceptor(batch_data, results, selection_cache, on_result):
+    def accept(i: int, record: dict, cache: bool = True):
+        results[i] = record
+        if cache and selection_cache is not None:
+            selection_cache.put(batch_data[i], record)
+        if on_result is not None:
+            on_result(i, record)
+    return accept
+
+
+def _selection_shards(batch_data: list[dict], misses: list[int]):
+    """
+    Only the ambiguous, uncached queries go into selection prompts, split
+    into token-budgeted shards: [(indices into batch_data, prompt)].
+    """
+    pending = [batch_data[i] for i in misses]
+    return [
+        ([misses[j] for j in shard], prompt)
+        for shard, prompt in build_sharded_prompts(pending, max_output_tokens=LLM_MAX_TOKENS)
+    ]
+
+
+def _attempt_shards(batch_data: list[dict], pending: list[int], attempt: int):
+    # first attempt: token-budgeted shards; retries: every leftover query on its own
+    if attempt == 0:
+        return _selection_shards(batch_data, pending)
+    return [shard for i in pending for shard in _selection_shards(batch_data, [i])]
+
+
+def _give_up(batch_data, remaining, accept):
+    for i in remaining:
+        logger.warning("No valid selection for %r from the LLM", batch_data[i]["query"])
+        accept(i, _empty_selection(batch_data[i]["query"], "No valid selection returned by the LLM"), cache=False)
+
+
+def _select_shard(llm, batch_data, shard, prompt, accept) -> list[int]:
+    # a failed call leaves its queries open: retried alone, then given a fallback record
+    collector = _ShardCollector(batch_data, shard, accept)
+    try:
+        collector.feed(llm(prompt, validate=_answers_shard(batch_data, shard)))
+    except Exception:
+        logger.warning("Selection call for %d queries failed", len(shard), exc_info=True)
+    return collector.close()
+
+
+def select_products(batch_data: list[dict], llm, selection_cache=None, fast_path=None,
+                    on_result=None) -> list[dict]:
+    """
+    Stage 2 for a batch. Rule / cache decisions come first; the rest go to
+    the LLM in concurrent shards whose records are taken element by
+    element. `on_result(index, record)` is called for every query as soon
+    as its record is known.
+    """
+    results, misses = _resolve_without_llm(batch_data, selection_cache, fast_path, on_result)
+    if not misses:
+        return results
+
+    accept = _acceptor(batch_data, results, selection_cache, on_result)
+    remaining = misses
+    with ThreadPoolExecutor(max_workers=max(1, SELECTION_WORKERS)) as pool:
+        for attempt in range(SELECTION_RETRIES + 1):
+            shards = _attempt_shards(batch_data, remaining, attempt)
+            left = pool.map(lambda sp: _select_shard(llm, batch_data, *sp, accept), shards)
+            remaining = [i for shard_left in left for i in shard_left]
+            if not remaining:
+                break
+
+    _give_up(batch_data, remaining, accept)
+    return results
+
+
+async def _select_shard_async(llm_client, batch_data, shard, prompt, accept) -> list[int]:
+    collector = _ShardCollector(batch_data, shard, accept)
+    # the answer is only cached when it resolves the whole shard
+    validate = _answers_shard(batch_data, shard)
+    try:
+        if hasattr(llm_client, "stream"):
+            # records are taken as soon as their closing brace streams in
+            async for chunk in llm_client.stream(prompt, validate):
+                collector.feed(chunk)
+        else:
+            collector.feed(await llm_client.complete(prompt, validate))
+    except Exception:
+        logger.warning("Selection call for %d queries failed", len(shard), exc_info=True)
+    return collector.close()
+
+
+async def select_products_async(batch_data: list[dict], llm_client, selection_cache=None,
+                                fast_path=None, on_result=None) -> list[dict]:
+    """select_products() with streamed LLM answers; concurrency is bounded by the client."""
+    results, misses = _resolve_without_llm(batch_data, selection_cache, fast_path, on_result)
+    if not misses:
+        return results
+
+    accept = _acceptor(batch_data, results, selection_cache, on_result)
+    remaining = misses
+    for attempt in range(SELECTION_RETRIES + 1):
+        shards = _attempt_shards(batch_data, remaining, attempt)
+        left = await asyncio.gather(*(
+            _select_shard_async(llm_client, batch_data, shard, prompt, accept)
+            for shard, prompt in shards
+        ))
+        remaining = [i for shard_left in left for i in shard_left]
+        if not remaining:
+            break
+
+    _give_up(batch_data, remaining, accept)
+    return results
+
+
+def _normalizer(retriever, mode: str):
+    # the local normalizer's vocabulary comes from the retriever's BM25 index
+    return retriever.normalizer if mode != "llm" else None
+
 
-final_outputs = json.loads(llm_result)
+async def local_normalizer(retriever, mode: str):
+    # the first use after an index (re)load builds the spell fixer: off the event loop
+    return await asyncio.to_thread(_normalizer, retriever, mode) if mode != "llm" else None
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(final_outputs, f, indent=2)
 
-print("LLM selection completed successfully.")
+def match(raw_input_text: str, retriever, llm, top_k: int = TOP_K, verbose: bool = False,
+          selection_cache=None, fast_path=None, normalizer_mode: str = NORMALIZER_MODE,
+          filters: dict = None) -> list[dict]:
+    """normalize -> retrieve -> select for one input paragraph."""
+    queries = normalize_input(raw_input_text, llm, normalizer_mode, _normalizer(retriever, normalizer_mode))
+    batch_data = retrieve_candidates(queries, retriever, top_k, filters)
+
+    if verbose:
+        pretty_print_batch_data(batch_data)
+
+    return select_products(batch_data, llm, selection_cache, fast_path)
+
+
+async def match_async(raw_input_text: str, retriever, llm_client, top_k: int = TOP_K,
+                      selection_cache=None, fast_path=None,
+                      normalizer_mode: str = NORMALIZER_MODE, filters: dict = None) -> list[dict]:
+    """match() with non-blocking LLM calls; retrieval runs in a worker thread."""
+    queries = await normalize_input_async(
+        raw_input_text, llm_client, normalizer_mode, await local_normalizer(retriever, normalizer_mode)
+    )
+    batch_data = await asyncio.to_thread(retrieve_candidates, queries, retriever, top_k, filters)
+
+    return await select_products_async(batch_data, llm_client, selection_cache, fast_path)
+
+
+# =====================================================
+# PIPELINED MATCHING
+# =====================================================
+# normalize -> retrieve -> select as concurrent stages joined by bounded
+# queues: queries are retrieved while the normalizer is still streaming
+# lines, and selection micro-batches go out while later queries are still
+# being retrieved, so a large order takes about as long as its slowest
+# stage instead of the sum of all three.
+
+_DONE = object()
+
+
+async def _normalized_lines(llm_client, prompt: str):
+    """Stage 0 LLM output, one cleaned item at a time as lines complete."""
+    if not hasattr(llm_client, "stream"):
+        for query in _parse_normalized(await llm_client.complete(prompt, _has_queries)):
+            yield query
+        return
+
+    pending = ""
+    async for chunk in llm_client.stream(prompt, _has_queries):
+        *lines, pending = (pending + chunk).split("\n")
+        for line in lines:
+            if line.strip():
+                yield line.strip()
+    if pending.strip():
+        yield pending.strip()
+
+
+async def _listed(queries):
+    for query in queries:
+        yield query
+
+
+async def _normalize_stage(raw_input_text, llm_client, mode, normalizer, out: asyncio.Queue):
+    """Stage 0: (query index, query) onto `out` as normalized items become available."""
+    queries = _normalize_locally(raw_input_text, mode, normalizer)
+    if queries is None:
+        normalization_metrics.record("llm")
+        queries = _normalized_lines(llm_client, build_input_normalization_prompt(raw_input_text))
+    else:
+        queries = _listed(queries)
+
+    count = 0
+    async for query in queries:
+        await out.put((count, query))
+        count += 1
+    for _ in range(RETRIEVAL_WORKERS):
+        await out.put(_DONE)
+
+
+async def _retrieve_stage(retriever, top_k, filters, inp: asyncio.Queue, out: asyncio.Queue):
+    """One retrieval worker: whatever queries are waiting, as one batch."""
+    done = False
+    while not done:
+        item = await inp.get()
+        if item is _DONE:
+            return
+        batch = [item]
+        while len(batch) < RETRIEVAL_BATCH and not inp.empty():
+            item = inp.get_nowait()
+            if item is _DONE:
+                done = True
+                break
+            batch.append(item)
+
+        indices, queries = zip(*batch)
+        retrieved = await asyncio.to_thread(retrieve_candidates, list(queries), retriever, top_k, filters)
+        for i, batch_item in zip(indices, retrieved):
+            await out.put((i, batch_item))
+
+
+async def _select_stage(llm_client, selection_cache, fast_path, inp: asyncio.Queue, results: dict, on_result):
+    """Selection micro-batches of up to SELECTION_BATCH queries, each sent as soon as it is full or lingered."""
+    loop = asyncio.get_running_loop()
+    tasks = []
+    try:
+        done = False
+        while not done:
+            item = await inp.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            deadline = loop.time() + SELECTION_LINGER
+            while len(batch) < SELECTION_BATCH and loop.time() < deadline:
+                try:
+                    item = await asyncio.wait_for(inp.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            tasks.append(asyncio.create_task(
+                _select_micro_batch(batch, llm_client, selection_cache, fast_path, results, on_result)
+            ))
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _select_micro_batch(batch, llm_client, selection_cache, fast_path, results: dict, on_result):
+    indices = [i for i, _ in batch]
+
+    def emit(j: int, record: dict):
+        results[indices[j]] = record
+        if on_result is not None:
+            on_result(indices[j], record)
+
+    await select_products_async([item for _, item in batch], llm_client, selection_cache, fast_path, emit)
+
+
+async def match_pipelined(raw_input_text: str, retriever, llm_client, top_k: int = TOP_K,
+                          selection_cache=None, fast_path=None, normalizer_mode: str = NORMALIZER_MODE,
+                          filters: dict = None, on_result=None) -> list[dict]:
+    """
+    match_async() with the three stages overlapped. Returns the records in
+    query order; `on_result(query index, record)` fires as each one lands.
+    """
+    queries = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+    retrieved = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+    results = {}
+
+    async def retrieve():
+        await asyncio.gather(*(
+            _retrieve_stage(retriever, top_k, filters, queries, retrieved)
+            for _ in range(RETRIEVAL_WORKERS)
+        ))
+        await retrieved.put(_DONE)
+
+    normalizer = await local_normalizer(retriever, normalizer_mode)
+    stages = [
+        asyncio.create_task(_normalize_stage(raw_input_text, llm_client, normalizer_mode, normalizer, queries)),
+        asyncio.create_task(retrieve()),
+        asyncio.create_task(_select_stage(llm_client, selection_cache, fast_path, retrieved, results, on_result)),
+    ]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        # a failed stage must not leave the others blocked on a queue
+        for stage in stages:
+            stage.cancel()
+
+    return [results[i] for i in sorted(results)]
+
+
+async def _run_pipelined(raw_input_text, retriever, llm_backend, top_k, normalizer_mode, filters):
+    from llm_client import new_async_llm
+
+    llm_client = new_async_llm(llm_backend)
+    try:
+        return await match_pipelined(
+            raw_input_text, retriever, llm_client, top_k, get_selection_cache(), get_fast_path(),
+            normalizer_mode, filters
+        )
+    finally:
+        await llm_client.aclose()
+
+
+def run(input_file: str = INPUT_FILE, output_file: str = OUTPUT_FILE, llm_backend: str = None,
+        top_k: int = TOP_K, normalizer_mode: str = NORMALIZER_MODE, verbose: bool = True,
+        filters: dict = None, pipelined: bool = False):
+    """
+    Match the items in `input_file` and write the selection records to
+    `output_file`. `filters` ({"category": ..., "brand": ..., "status": ...})
+    restricts retrieval to matching catalog products. `pipelined` runs the
+    stages overlapped (match_pipelined) on the async LLM client.
+    """
+    # chromadb / embedding model are only loaded once there is work to do
+    from retrieval import HybridRetriever
+
+    retriever = HybridRetriever(debug=verbose)
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        raw_input_text = f.read().strip()
+
+    if pipelined:
+        final_outputs = asyncio.run(_run_pipelined(
+            raw_input_text, retriever, llm_backend, top_k, normalizer_mode, filters
+        ))
+    else:
+        final_outputs = match(
+            raw_input_text, retriever, get_llm(llm_backend), top_k, verbose=verbose,
+            selection_cache=get_selection_cache(), fast_path=get_fast_path(),
+            normalizer_mode=normalizer_mode, filters=filters
+        )
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(final_outputs, f, indent=2)
+
+    print(f"Normalization paths: {normalization_metrics.stats()}")
+    print(f"Selection paths: {selection_metrics.stats()}")
+    print("LLM selection completed successfully.")
+
+
+def main():
+    run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import os
+import re
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+NORMALIZER_MODE = os.getenv("NORMALIZER_MODE", "llm")  # llm | local | auto
+MIN_CONFIDENCE = 0.8
+MAX_ITEM_WORDS = 12
+MIN_CORRECTABLE_LEN = 5  # shorter words are one edit away from too many others ("hard" -> "card")
+
+# everyday English that order text uses and a catalog may not: never "corrected"
+COMMON_WORDS = frozenset("""
+    about above after again along always another around available based before below better between
+    black bought brand build cable cables change cheap cheaper check clean clear close color colour
+    could cover daily delivery different drive drives each either email enough every extra first
+    fitted front full great green heavy house large later least light lighter little local lower
+    maybe might model money month more needed never night number often older order other outdoor
+    owner packs parts plain plant please point power price quick quiet rather ready right round
+    same second short should silver since small smaller sound spare stand still store
+    strong supply table thank thanks their there these thick thing think third those three
+    through today total under until urgent using value various very water where which while white
+    whole width would yellow
+""".split())
+
+# item separators: line breaks, commas, "and", sentence ends (not "2.5")
+_SEPARATORS = re.compile(
+    r"\n|[,;]|\s+(?:and|&|plus|along with|as well as|together with)\s+|\.(?=\s|$)",
+    re.I,
+)
+_LEADING_FILLER = re.compile(
+    r"^(?:(?:we|i)\s+(?:also\s+)?(?:need|want|require|would like)(?:\s+to\s+order)?"
+    r"|please|also|add|order|include|with|then|a|an|the|some)\b\s*",
+    re.I,
+)
+_TRAILING_FILLER = re.compile(
+    r"\s+(?:for\s+(?:the\s+|our\s+|a\s+)?(?:build|testing|test|project|office|team|setup)"
+    r"|as well|too|also|please)$",
+    re.I,
+)
+_WORD = re.compile(r"[A-Za-z]+(?:'[a-z]+)?")
+# model / serial identifiers stay untouched: GX-850, i7-13700K, 32GB, RTX4080
+_IDENTIFIER = re.compile(r"^(?=.*\d)[A-Za-z0-9]+(?:[-/.][A-Za-z0-9]+)*$")
+
+
+def edit_distance(a: str, b: str, limit: int = None) -> int:
+    """Levenshtein distance; stops early once every path exceeds `limit`."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# =====================================================
+# SPELLING CORRECTION AGAINST THE CATALOG VOCABULARY
+# =====================================================
+class SpellFixer:
+    """
+    Single-edit spelling correction (symmetric deletes) against words that
+    occur in the catalog; ties go to the word used in more products. Words
+    in the catalog, in COMMON_WORDS or shorter than MIN_CORRECTABLE_LEN are
+    left alone.
+    """
+
+    def __init__(self, word_counts: dict):
+        self.vocabulary = {w for w in word_counts if w.isalpha()}
+        self.word_counts = {
+            w: n for w, n in word_counts.items()
+            if w in self.vocabulary and len(w) >= MIN_CORRECTABLE_LEN
+        }
+        self._deletes = {}
+        for word in self.word_counts:
+            for variant in _deletes(word):
+                self._deletes.setdefault(variant, []).append(word)
+
+    def correct(self, word: str) -> str:
+        lower = word.lower()
+        if len(lower) < MIN_CORRECTABLE_LEN or lower in self.vocabulary or lower in COMMON_WORDS:
+            return word
+
+        candidates = set()
+        for variant in _deletes(lower) | {lower}:
+            candidates.update(self._deletes.get(variant, ()))
+        candidates = [c for c in candidates if edit_distance(lower, c, limit=1) <= 1]
+        if not candidates:
+            return word
+
+        best = max(candidates, key=lambda c: (self.word_counts[c], c))
+        if word.isupper():
+            return best.upper()
+        if word[0].isupper():
+            return best.capitalize()
+        return best
+
+
+def _deletes(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))} | {word}
+
+
+# =====================================================
+# RULE-BASED INPUT NORMALIZER
+# =====================================================
+class RuleBasedNormalizer:
+    """
+    Local stand-in for the Stage 0 normalization prompt: splits the text
+    into item lines, strips connector / filler words, fixes spelling
+    against the catalog vocabulary and keeps identifiers intact.
+    """
+
+    def __init__(self, word_counts: dict = None):
+        self.speller = SpellFixer(word_counts or {})
+        self.known_words = self.speller.vocabulary
+
+    @classmethod
+    def from_bm25(cls, bm25_index):
+        """Vocabulary and document frequencies straight from the BM25 index."""
+        import numpy as np  # only needed here; keeps `import logic` light
+
+        df = np.diff(bm25_index.inv_indptr)
+        return cls({term: int(n) for term, n in zip(bm25_index.vocab, df) if n})
+
+    def normalize(self, text: str):
+        """Return (queries, confidence in [0, 1])."""
+        items = []
+        for segment in _SEPARATORS.split(text):
+            item = self._clean(segment)
+            if item and item.lower() not in (i.lower() for i in items):
+                items.append(item)
+
+        if not items:
+            return [], 0.0
+
+        plausible = sum(self._plausible(item) for item in items)
+        return items, plausible / len(items)
+
+    def _clean(self, segment: str) -> str:
+        item = " ".join(segment.split()).strip(" .:-")
+        previous = None
+        while item and item != previous:
+            previous = item
+            item = _LEADING_FILLER.sub("", item).strip()
+            item = _TRAILING_FILLER.sub("", item).strip()
+
+        return " ".join(self._fix_token(token) for token in item.split())
+
+    def _fix_token(self, token: str) -> str:
+        if _IDENTIFIER.match(token) or not _WORD.fullmatch(token):
+            return token
+        return self.speller.correct(token)
+
+    def _plausible(self, item: str) -> bool:
+        # one product per line: short, and anchored by a catalog word or an identifier
+        tokens = item.split()
+        if len(tokens) > MAX_ITEM_WORDS:
+            return False
+        return any(
+            _IDENTIFIER.match(t) or t.lower() in self.known_words
+            for t in tokens
+        ) or not self.known_words
@@ -1,4 +1,15 @@
-def build_llm_prompt_batch(batch_data: list[dict]) -> str:
+import os
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+PROMPT_FORMAT = os.getenv("PROMPT_FORMAT", "compact")  # compact | verbose
+COMPACT_DETAILS_CHARS = 160
+COMPACT_COLUMNS = "id | name | category | score | details"
+_DUPLICATED_FIELDS = ("Product Name", "Category")  # already in their own columns
+
+
+def build_llm_prompt_batch(batch_data: list[dict], prompt_format: str = PROMPT_FORMAT) -> str:
     """
     batch_data = [
       {
@@ -16,12 +27,20 @@ def build_llm_prompt_batch(batch_data: list[dict]) -> str:
     ]
     """
 
-    blocks = []
+    blocks = [build_query_block(idx, item, prompt_format) for idx, item in enumerate(batch_data, start=1)]
+    return build_selection_prompt("\n\n".join(blocks), prompt_format)
+
 
-    for idx, item in enumerate(batch_data, start=1):
-        candidate_block = "\n".join(
-            [
-                f"""
+def build_query_block(idx: int, item: dict, prompt_format: str = PROMPT_FORMAT) -> str:
+    """One numbered query with its retrieved candidates."""
+    if prompt_format == "compact":
+        return _compact_query_block(idx, item)
+    if prompt_format != "verbose":
+        raise ValueError(f"Unknown prompt format: {prompt_format}")
+
+    candidate_block = "\n".join(
+        [
+            f"""
 Candidate {i+1}:
 - Product ID: {c['product_id']}
 - Product Name: {c['product_name']}
@@ -29,12 +48,11 @@ Candidate {i+1}:
 - Distance Score: {c['distance']}
 - Description: {c['description']}
 """.strip()
-                for i, c in enumerate(item["candidates"])
-            ]
-        )
+            for i, c in enumerate(item["candidates"])
+        ]
+    )
 
-        blocks.append(
-            f"""
+    return f"""
 Query {idx}:
 User Query:
 "{item['query']}"
@@ -42,10 +60,54 @@ User Query:
 Retrieved Candidates:
 {candidate_block}
 """.strip()
-        )
 
-    joined_blocks = "\n\n".join(blocks)
 
+# =====================================================
+# COMPACT CANDIDATE TABLE
+# =====================================================
+# One row per candidate instead of a five-line block, the match score
+# rounded to two decimals, and the description without the name /
+# category lines it repeats, cut at COMPACT_DETAILS_CHARS.
+
+def _cell(value) -> str:
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _compact_details(description: str) -> str:
+    parts = []
+    for line in str(description).splitlines():
+        label, sep, value = line.strip().partition(": ")
+        if sep and label in _DUPLICATED_FIELDS:
+            continue
+        value = value if sep else line
+        if value.strip():
+            parts.append(_cell(value))
+    details = "; ".join(parts)
+    if len(details) > COMPACT_DETAILS_CHARS:
+        details = details[:COMPACT_DETAILS_CHARS].rsplit(" ", 1)[0] + "..."
+    return details
+
+
+def _compact_query_block(idx: int, item: dict) -> str:
+    rows = [
+        " | ".join((
+            _cell(c["product_id"]),
+            _cell(c["product_name"]),
+            _cell(c["category"]),
+            f"{c.get('hybrid_score', 1 - c['distance']):.2f}",
+            _compact_details(c["description"]),
+        ))
+        for c in item["candidates"]
+    ]
+    return "\n".join([f'Query {idx}: "{item["query"]}"', COMPACT_COLUMNS, *rows])
+
+
+def build_selection_prompt(joined_blocks: str, prompt_format: str = PROMPT_FORMAT) -> str:
+    """The Stage 2 instructions around already rendered query blocks."""
+    layout = (
+        f"- Candidates are table rows: {COMPACT_COLUMNS} (score: higher is a closer match)\n"
+        if prompt_format == "compact" else ""
+    )
     return f"""
 You are a product catalog matching assistant.
 
@@ -54,7 +116,7 @@ Task:
 - Use ONLY the retrieved candidates
 - Do NOT invent products
 - If no candidate is suitable, return nulls
-
+{layout}
 {joined_blocks}
 
 Return STRICT JSON ONLY in the following format:
@@ -0,0 +1,91 @@
+import math
+import os
+
+from prompt_builder import PROMPT_FORMAT, build_llm_prompt_batch, build_query_block, build_selection_prompt
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))  # input tokens per selection prompt
+SHARD_MAX_QUERIES = int(os.getenv("SHARD_MAX_QUERIES", "8"))          # smaller shards run in parallel
+OUTPUT_TOKENS_PER_QUERY = 90  # one selection record, with a short reason
+CHARS_PER_TOKEN = 3.5         # conservative for English text + product codes
+CANDIDATE_PRUNING = os.getenv("CANDIDATE_PRUNING", "1") != "0"
+MIN_PROMPT_CANDIDATES = 2
+KEEP_RATIO = 0.5  # drop candidates scoring below this fraction of the top score
+GAP_RATIO = 0.25  # ... or after a drop of this fraction of the top score
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free token estimate; errs on the high side."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# =====================================================
+# CANDIDATE PRUNING
+# =====================================================
+def prune_candidates(candidates: list[dict], min_keep: int = MIN_PROMPT_CANDIDATES,
+                     keep_ratio: float = KEEP_RATIO, gap_ratio: float = GAP_RATIO) -> list[dict]:
+    """
+    The plausible head of a ranked candidate list: walking down by hybrid
+    score, stop below keep_ratio * top or at the first drop of at least
+    gap_ratio * top, keeping at least `min_keep`. Candidates with an
+    identifier match are always kept.
+    """
+    ranked = sorted(candidates, key=lambda c: c.get("hybrid_score", 0.0), reverse=True)
+    top = ranked[0].get("hybrid_score", 0.0) if ranked else 0.0
+    if len(ranked) <= min_keep or top <= 0:
+        return ranked
+
+    cut = min_keep
+    while cut < len(ranked):
+        score = ranked[cut].get("hybrid_score", 0.0)
+        if score < keep_ratio * top or ranked[cut - 1].get("hybrid_score", 0.0) - score >= gap_ratio * top:
+            break
+        cut += 1
+    return ranked[:cut] + [c for c in ranked[cut:] if c.get("numeric_match")]
+
+
+def pruned(batch_data: list[dict]) -> list[dict]:
+    return [dict(item, candidates=prune_candidates(item["candidates"])) for item in batch_data]
+
+
+# =====================================================
+# SELECTION PROMPT PLANNER
+# =====================================================
+def plan_shards(batch_data: list[dict], token_budget: int = PROMPT_TOKEN_BUDGET,
+                max_output_tokens: int = None, max_queries: int = SHARD_MAX_QUERIES,
+                prompt_format: str = PROMPT_FORMAT) -> list[list[int]]:
+    """
+    Split batch_data into shards (lists of indices, in order) so that each
+    selection prompt stays within `token_budget` input tokens, its JSON
+    answer fits in `max_output_tokens`, and it has at most `max_queries`
+    queries. A query block that alone exceeds the budget gets its own shard.
+    """
+    overhead = estimate_tokens(build_selection_prompt("", prompt_format))
+    max_queries = max(1, max_queries)
+    if max_output_tokens is not None:
+        max_queries = max(1, min(max_queries, max_output_tokens // OUTPUT_TOKENS_PER_QUERY))
+
+    shards, shard, used = [], [], overhead
+    for i, item in enumerate(batch_data):
+        cost = estimate_tokens(build_query_block(len(shard) + 1, item, prompt_format)) + 1
+        if shard and (used + cost > token_budget or len(shard) >= max_queries):
+            shards.append(shard)
+            shard, used = [], overhead
+        shard.append(i)
+        used += cost
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def build_sharded_prompts(batch_data: list[dict], prune: bool = CANDIDATE_PRUNING,
+                          prompt_format: str = PROMPT_FORMAT, **limits) -> list[tuple[list[int], str]]:
+    """[(indices into batch_data, selection prompt)] for every shard."""
+    if prune:
+        batch_data = pruned(batch_data)
+    return [
+        (shard, build_llm_prompt_batch([batch_data[i] for i in shard], prompt_format))
+        for shard in plan_shards(batch_data, prompt_format=prompt_format, **limits)
+    ]
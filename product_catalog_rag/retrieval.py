@@ -0,0 +1,394 @@
+import logging
+import os
+import numpy as np
+import threading
+import time
+
+from bm25_index import BM25_DIR, tokenize, load_or_build
+from embedder import EMBEDDING_BACKEND, make_embedder
+from embedding_cache import QueryEmbeddingCache, cached
+from facet_index import FACET_DIR, chroma_where
+from facet_index import load_or_build as load_or_build_facets
+from fusion import fuse, min_max, top_k_indices
+from identifier_index import EXACT_WEIGHT, IDENT_DIR
+from identifier_index import load_or_build as load_or_build_identifiers
+from index_pointer import POINTER_PATH, pointer_stamp, read_pointer, versioned_name
+from normalizer import RuleBasedNormalizer
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+CHROMA_DIR = "chroma_db"
+COLLECTION_NAME = "products_catalog"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+BM25_CANDIDATES = 25
+VECTOR_CANDIDATES = 25
+IDENT_CANDIDATES = 10
+INFER_FILTERS = os.getenv("INFER_FILTERS", "0") == "1"  # category / brand filters from the query text
+STATUS_FILTER = [s.strip() for s in os.getenv("STATUS_FILTER", "").split(",") if s.strip()]  # e.g. Active,Legacy
+FUSION_METHOD = "weighted"
+DEBUG_HYBRID = True
+RELOAD_CHECK_SECONDS = 5.0  # how often a retriever looks at the active index pointer
+
+
+def _candidate(doc_id, meta, distance, bm25=0.0, vector_hit=True):
+    # "doc" is filled in after ranking, for the final top-k only
+    return {
+        "id": doc_id,
+        "product_id": meta["product_id"],
+        "product_name": meta["product_name"],
+        "category": meta["category"],
+        "doc": None,
+        "distance": distance,
+        "bm25": bm25,
+        "numeric_match": 0,
+        "exact_identifier": False,
+        "vector_hit": vector_hit
+    }
+
+
+def _index_dir(record, key, default):
+    # pointers written before `key` existed: the index of the same version
+    if record.get(key):
+        return record[key]
+    return versioned_name(default, record["version"]) if "version" in record else default
+
+
+# =====================================================
+# HYBRID RETRIEVER
+# =====================================================
+class HybridRetriever:
+    """
+    Embedding model, Chroma collection and BM25 index, loaded once and
+    shared by every query (CLI run or long-running server).
+
+    Unless a collection name is passed explicitly, the collection and BM25
+    directory come from the active index pointer (see index_pointer.py) and
+    are hot-reloaded when a re-index repoints it.
+    """
+
+    def __init__(
+        self,
+        chroma_dir: str = CHROMA_DIR,
+        collection_name: str = None,
+        bm25_dir: str = None,
+        fusion_method: str = FUSION_METHOD,
+        debug: bool = DEBUG_HYBRID,
+        pointer_path: str = POINTER_PATH,
+        infer_filters: bool = INFER_FILTERS,
+    ):
+        self.fusion_method = fusion_method
+        self.infer_filters = infer_filters
+        self.debug = debug
+        self.pointer_path = pointer_path
+        self.pinned = collection_name is not None
+
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=chroma_dir)
+        self.embedding_model = None
+        self.embedder = None
+        self.index_version = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # one reload at a time
+        self._next_check = 0.0
+        self._stamp = None
+
+        if self.pinned:
+            self._load({
+                "collection": collection_name,
+                "bm25_dir": bm25_dir or BM25_DIR,
+                "embedding_model": EMBEDDING_MODEL,
+            })
+        else:
+            self._stamp = pointer_stamp(pointer_path)
+            self._load(self._active_record())
+
+    def _active_record(self) -> dict:
+        # before the first versioned build: the original unversioned collection
+        return read_pointer(self.pointer_path) or {
+            "collection": COLLECTION_NAME,
+            "bm25_dir": BM25_DIR,
+            "embedding_model": EMBEDDING_MODEL,
+        }
+
+    def _load(self, record: dict):
+        model = record.get("embedding_model", EMBEDDING_MODEL)
+        if model == self.embedding_model:
+            embedder = self.embedder
+        else:
+            # queries are embedded here (EMBEDDING_BACKEND), not by Chroma
+            embedder = make_embedder(EMBEDDING_BACKEND, model, workers=1)
+        collection = self.client.get_collection(name=record["collection"], embedding_function=None)
+        # persisted next to chroma_db, built once if missing
+        bm25_index = load_or_build(collection, record["bm25_dir"])
+        ident_index = load_or_build_identifiers(collection, _index_dir(record, "identifier_dir", IDENT_DIR))
+        facet_index = load_or_build_facets(collection, _index_dir(record, "facet_dir", FACET_DIR))
+
+        with self._lock:
+            self.embedding_model = model
+            self.embedder = embedder
+            # repeated queries skip the embedding model
+            self.query_cache = QueryEmbeddingCache()
+            self.embed_queries = cached(embedder, self.query_cache)
+            self.collection = collection
+            self.bm25_index = bm25_index
+            self.ident_index = ident_index
+            self.facet_index = facet_index
+            self.index_version = (record.get("version"), record.get("revision"))
+            self._normalizer = None
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload if the active index pointer changed since the last load.
+        Checked at most every RELOAD_CHECK_SECONDS; while one request
+        reloads, the others keep serving the current index. A failed reload
+        keeps serving the current index too. Returns True when a new index
+        was loaded.
+        """
+        if self.pinned or (not force and time.monotonic() < self._next_check):
+            return False
+        if not self._reload_lock.acquire(blocking=force):
+            return False
+        try:
+            # re-checked under the lock: another request may have just reloaded
+            now = time.monotonic()
+            if not force and now < self._next_check:
+                return False
+            self._next_check = now + RELOAD_CHECK_SECONDS
+
+            stamp = pointer_stamp(self.pointer_path)
+            if stamp == self._stamp:
+                return False
+            self._stamp = stamp
+
+            record = self._active_record()
+            if (record.get("version"), record.get("revision")) == self.index_version:
+                return False
+            try:
+                self._load(record)
+            except Exception:
+                logger.exception("Reload of index %s failed; keeping %s", record, self.index_version)
+                return False
+            logger.info("Switched to index %s (revision %s)", record["collection"], record.get("revision"))
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _snapshot(self):
+        # one consistent set of indexes per request
+        self.refresh()
+        with self._lock:
+            return self.collection, self.bm25_index, self.ident_index, self.facet_index, self.embed_queries
+
+    @property
+    def normalizer(self) -> RuleBasedNormalizer:
+        """Rule-based Stage 0 normalizer using the catalog vocabulary (built on first use)."""
+        with self._lock:
+            bm25_index, normalizer = self.bm25_index, self._normalizer
+        if normalizer is None:
+            normalizer = RuleBasedNormalizer.from_bm25(bm25_index)
+            with self._lock:
+                if self.bm25_index is bm25_index:
+                    self._normalizer = normalizer
+        return normalizer
+
+    def hybrid_retrieve_batch(self, queries: list[str], top_k: int = 10, filters=None) -> list[list[dict]]:
+        """
+        hybrid_retrieve for many queries at once: one embedding forward pass,
+        one Chroma request per distinct filter and one metadata fetch for all
+        keyword and identifier hits the vector search missed. Ranking only
+        needs metadata; document text is fetched afterwards, by id, for the
+        final top-k of every query. Returns one candidate list per query.
+
+        `filters` ({facet: value or [values]}, or one such dict per query)
+        restricts retrieval to matching products, pushed down to Chroma as a
+        where= clause and to BM25 as a facet bitmap. With infer_filters,
+        category / brand filters are also inferred from each query, and
+        dropped again for queries they leave with fewer than top_k candidates.
+        """
+        if not queries:
+            return []
+
+        indexes = self._snapshot()
+        collection, _, _, facet_index, embed_queries = indexes
+        explicit, inferred = self._query_filters(queries, filters, facet_index)
+        embeddings = np.asarray(embed_queries(queries))
+
+        batch_candidates = self._gather(
+            queries, embeddings, [dict(exp, **inf) for exp, inf in zip(explicit, inferred)], indexes
+        )
+
+        # ---- Relax inferred filters that left a query short ----
+        relax = [
+            qi for qi, candidates in enumerate(batch_candidates)
+            if inferred[qi] and len(candidates) < top_k
+        ]
+        if relax:
+            relaxed = self._gather(
+                [queries[qi] for qi in relax], embeddings[relax], [explicit[qi] for qi in relax], indexes
+            )
+            for qi, candidates in zip(relax, relaxed):
+                batch_candidates[qi] = candidates
+
+        ranked = [
+            self._rank_candidates(query, candidates, top_k)
+            for query, candidates in zip(queries, batch_candidates)
+        ]
+
+        # ---- Document text for the final top-k only ----
+        wanted = list({c["id"] for results in ranked for c in results})
+        if wanted:
+            fetched = collection.get(ids=wanted, include=["documents"])
+            docs = dict(zip(fetched["ids"], fetched["documents"]))
+            for results in ranked:
+                for c in results:
+                    c["doc"] = docs.get(c["id"], "")
+        return ranked
+
+    def hybrid_retrieve(self, query: str, top_k: int = 10, filters: dict = None):
+        return self.hybrid_retrieve_batch([query], top_k, filters)[0]
+
+    def _query_filters(self, queries, filters, facet_index):
+        """(explicit, inferred) resolved filters for every query."""
+        if filters is None or isinstance(filters, dict):
+            filters = [filters] * len(queries)
+        if len(filters) != len(queries):
+            raise ValueError(f"Got {len(filters)} filters for {len(queries)} queries")
+
+        base = {"status": STATUS_FILTER} if STATUS_FILTER else {}
+        explicit = [facet_index.resolve(dict(base, **(f or {}))) for f in filters]
+        inferred = [
+            {facet: values for facet, values in facet_index.infer(query).items() if facet not in exp}
+            if self.infer_filters else {}
+            for query, exp in zip(queries, explicit)
+        ]
+        return explicit, inferred
+
+    def _gather(self, queries, embeddings, batch_filters, indexes):
+        """Candidates (chroma id -> candidate) for every query."""
+        collection, bm25_index, ident_index, facet_index, _ = indexes
+
+        # ---- Vector recall, one Chroma request per distinct filter ----
+        groups = {}
+        for qi, query_filters in enumerate(batch_filters):
+            groups.setdefault(tuple(sorted(query_filters.items())), []).append(qi)
+
+        vector_hits = [None] * len(queries)
+        for key, group in groups.items():
+            where = chroma_where(dict(key))
+            results = collection.query(
+                query_embeddings=embeddings[group],
+                n_results=VECTOR_CANDIDATES,
+                include=["metadatas", "distances"],
+                **({"where": where} if where else {})
+            )
+            for row, qi in enumerate(group):
+                vector_hits[qi] = zip(results["ids"][row], results["metadatas"][row], results["distances"][row])
+
+        # ---- BM25 keyword recall, the whole batch against the inverted index ----
+        batch_tokens = [tokenize(query) for query in queries]
+        bm25_hits = bm25_index.top_k_batch(batch_tokens, BM25_CANDIDATES, [
+            facet_index.bm25_bitmap(bm25_index, query_filters) if query_filters else None
+            for query_filters in batch_filters
+        ])
+
+        batch_candidates = []
+        batch_ident_hits = []
+        extra_hits = {}  # chroma id -> [(query index, bm25 score)], not found by vector search
+
+        for qi, query in enumerate(queries):
+            query_filters = batch_filters[qi]
+            candidates = {}  # chroma id -> candidate
+
+            for doc_id, meta, dist in vector_hits[qi]:
+                candidates[doc_id] = _candidate(doc_id, meta, dist)
+
+            # ---- BM25 keyword ----
+            tokens = batch_tokens[qi]
+
+            # rows a running sync upserted before its BM25 revision is live are unknown (0)
+            ids = list(candidates)
+            pos = bm25_index.positions(ids)
+            known = pos >= 0
+            vec_bm25 = bm25_index.score_docs(tokens, pos[known])
+            for doc_id, score in zip(np.asarray(ids)[known], vec_bm25):
+                candidates[doc_id]["bm25"] = float(score)
+
+            missed = {}
+            for idx, score in bm25_hits[qi]:
+                doc_id = str(bm25_index.doc_ids[idx])
+                if doc_id not in candidates:
+                    missed[doc_id] = score
+
+            # ---- Identifier recall (model codes / SKUs / numbers) ----
+            ident_hits = ident_index.match(query)
+            ident_only = [
+                doc_id for doc_id, _ in ident_index.recall(ident_hits, IDENT_CANDIDATES)
+                if doc_id not in candidates and doc_id not in missed
+            ]
+            if ident_only and query_filters:
+                ident_only = [
+                    doc_id for doc_id, ok in zip(ident_only, facet_index.allows(ident_only, query_filters)) if ok
+                ]
+            if ident_only:
+                pos = bm25_index.positions(ident_only)
+                scores = np.zeros(len(ident_only))
+                scores[pos >= 0] = bm25_index.score_docs(tokens, pos[pos >= 0])
+                missed.update(zip(ident_only, scores.tolist()))
+
+            for doc_id, score in missed.items():
+                extra_hits.setdefault(doc_id, []).append((qi, score))
+            batch_candidates.append(candidates)
+            batch_ident_hits.append(ident_hits)
+
+        if extra_hits:
+            # metadata is fetched by id only for hits the vector search missed;
+            # ids a sync already deleted from Chroma are absent and dropped
+            fetched = collection.get(ids=list(extra_hits), include=["metadatas"])
+            for doc_id, meta in zip(fetched["ids"], fetched["metadatas"]):
+                for qi, score in extra_hits[doc_id]:
+                    batch_candidates[qi][doc_id] = _candidate(doc_id, meta, 1.0, score, vector_hit=False)
+
+        # ---- Identifier match: one lookup per query, not a regex per candidate ----
+        for candidates, ident_hits in zip(batch_candidates, batch_ident_hits):
+            if ident_hits and candidates:
+                ids = list(candidates)
+                for doc_id, weight in zip(ids, ident_index.scores(ident_hits, ids)):
+                    candidates[doc_id]["numeric_match"] = float(weight)
+                    # prefix / fuzzy hits weigh in the fusion but are not a model-number match
+                    candidates[doc_id]["exact_identifier"] = bool(weight >= EXACT_WEIGHT)
+
+        return batch_candidates
+
+    def _rank_candidates(self, query: str, candidates: dict, top_k: int):
+        cands = list(candidates.values())
+        distance = np.array([c["distance"] for c in cands], dtype=np.float64)
+        bm25 = np.array([c["bm25"] for c in cands], dtype=np.float64)
+        numeric = np.array([c["numeric_match"] for c in cands], dtype=np.float64)
+        vector_hit = np.array([c["vector_hit"] for c in cands], dtype=bool)
+
+        # ---- Fuse & rank ----
+        scores = fuse(distance, bm25, numeric, self.fusion_method, vector_hit)
+        for c, score in zip(cands, scores):
+            c["hybrid_score"] = float(score)
+
+        if self.debug:
+            print("\n================ HYBRID DEBUG ================")
+            print(f"QUERY: {query}  (fusion: {self.fusion_method})\n")
+
+            n_vec = min_max(1 - distance)
+            n_bm25 = min_max(bm25)
+            for c, v, b in zip(cands, n_vec, n_bm25):
+                print(f"FINAL SCORE → {c['product_name']}")
+                print(f"  Distance            : {c['distance']:.4f}")
+                print(f"  BM25 score          : {c['bm25']:.4f}")
+                print(f"  Normalized semantic : {v:.4f}")
+                print(f"  Normalized BM25     : {b:.4f}")
+                print(f"  Numeric match       : {c['numeric_match']}")
+                print(f"  HYBRID SCORE        : {c['hybrid_score']:.4f}")
+                print("--------------------------------------------")
+
+        return [cands[i] for i in top_k_indices(scores, top_k)]
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+SELECTION_CACHE_PATH = os.getenv("SELECTION_CACHE_PATH", "selection_cache.sqlite3")
+SELECTION_CACHE_ENABLED = os.getenv("SELECTION_CACHE", "1") != "0"
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip(" .,;:").lower()
+
+
+def candidate_fingerprint(candidates: list[dict]) -> str:
+    pairs = sorted((c["product_id"], c["doc_hash"]) for c in candidates)
+    return hashlib.sha256(json.dumps(pairs).encode("utf-8")).hexdigest()
+
+
+# =====================================================
+# PER-QUERY SELECTION CACHE
+# =====================================================
+class SelectionCache:
+    """
+    Normalized query -> final selection record (the build_llm_prompt_batch
+    output schema), so repeated items skip Stage 2 entirely.
+
+    An entry is only served when the retrieved candidates (ids and document
+    hashes) are the same as when it was stored, and invalidate_changed()
+    drops entries whose products were edited or removed by a re-index.
+    """
+
+    def __init__(self, path: str = SELECTION_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS selections (
+                query_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                record TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS selection_products (
+                query_key TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                doc_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS selection_products_key ON selection_products(query_key);
+            CREATE INDEX IF NOT EXISTS selection_products_pid ON selection_products(product_id);
+            """
+        )
+
+    def get(self, item: dict):
+        """Cached record for a batch_data item ({"query", "candidates"}), or None."""
+        key = normalize_query(item["query"])
+        fingerprint = candidate_fingerprint(item["candidates"])
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, record FROM selections WHERE query_key = ?", (key,)
+            ).fetchone()
+            # counters change under the lock: lookups come from several threads
+            if row is None or row[0] != fingerprint:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return dict(json.loads(row[1]), input_query=item["query"])
+
+    def put(self, item: dict, record: dict):
+        key = normalize_query(item["query"])
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO selections (query_key, fingerprint, record, created) "
+                "VALUES (?, ?, ?, ?)",
+                (key, candidate_fingerprint(item["candidates"]), json.dumps(record), time.time()),
+            )
+            self._conn.execute("DELETE FROM selection_products WHERE query_key = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO selection_products (query_key, product_id, doc_hash) VALUES (?, ?, ?)",
+                [(key, c["product_id"], c["doc_hash"]) for c in item["candidates"]],
+            )
+            self._conn.execute("COMMIT")
+
+    def invalidate_changed(self, current_hashes: dict) -> int:
+        """
+        Drop entries that depend on a product whose document hash differs
+        from `current_hashes` ({product_id: doc_hash}) or that is no longer
+        in the catalog. Returns the number of entries removed.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS current_products "
+                "(product_id TEXT PRIMARY KEY, doc_hash TEXT NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM current_products")
+            self._conn.executemany(
+                "INSERT INTO current_products (product_id, doc_hash) VALUES (?, ?)",
+                list(current_hashes.items()),
+            )
+            stale = [
+                key for (key,) in self._conn.execute(
+                    """
+                    SELECT DISTINCT sp.query_key FROM selection_products sp
+                    LEFT JOIN current_products cp ON cp.product_id = sp.product_id
+                    WHERE cp.doc_hash IS NULL OR cp.doc_hash != sp.doc_hash
+                    """
+                )
+            ]
+            self._delete(stale)
+            self._conn.execute("COMMIT")
+        return len(stale)
+
+    def invalidate_products(self, product_ids) -> int:
+        """Drop entries that depend on any of `product_ids`."""
+        product_ids = list(product_ids)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            stale = set()
+            for start in range(0, len(product_ids), 500):
+                chunk = product_ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                stale.update(
+                    key for (key,) in self._conn.execute(
+                        f"SELECT DISTINCT query_key FROM selection_products WHERE product_id IN ({marks})",
+                        chunk,
+                    )
+                )
+            self._delete(list(stale))
+            self._conn.execute("COMMIT")
+        return len(stale)
+
+    def _delete(self, keys):
+        self._conn.executemany("DELETE FROM selections WHERE query_key = ?", [(k,) for k in keys])
+        self._conn.executemany("DELETE FROM selection_products WHERE query_key = ?", [(k,) for k in keys])
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM selections").fetchone()
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+
+
+def get_selection_cache():
+    """The process-wide cache, or None when disabled with SELECTION_CACHE=0."""
+    global _shared_cache
+    if not SELECTION_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        _shared_cache = SelectionCache()
+    return _shared_cache
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import logging
+from http import HTTPStatus
+
+from decision import get_fast_path, selection_metrics
+from facet_index import normalize_filters
+from http_server import start_json_server
+from llm_cache import get_llm_cache
+from llm_client import close_async_llm, get_async_llm
+from logic import TOP_K, match_pipelined, normalization_metrics, normalize_input_async, retrieve_candidates
+from logic import local_normalizer
+from normalizer import NORMALIZER_MODE
+from retrieval import HybridRetriever
+from selection_cache import get_selection_cache
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_TOP_K = 100
+
+
+# =====================================================
+# MATCH SERVICE
+# =====================================================
+class MatchService:
+    """
+    Keeps the retriever (embedding model, Chroma, BM25) resident. Retrieval
+    runs in worker threads and LLM calls go through the shared async client,
+    so requests are served concurrently.
+
+      GET  /health    -> process is up
+      GET  /ready     -> models and indexes are loaded
+      GET  /metrics   -> selection path and cache counters, active index
+      POST /match     {"text": "...", "normalizer": "llm|local|auto"} -> selection records
+      POST /retrieve  {"queries": ["..."], ...}  -> retrieved candidates
+
+    Both POST routes take optional "filters": {"category" / "brand" /
+    "status": value or [values]} to restrict retrieval.
+    """
+
+    def __init__(self, llm_client, retriever_factory=HybridRetriever, top_k: int = TOP_K,
+                 selection_cache=None, fast_path=None):
+        self.llm_client = llm_client
+        self.selection_cache = selection_cache
+        self.fast_path = fast_path
+        self.retriever_factory = retriever_factory
+        self.top_k = top_k
+        self.retriever = None
+        self.load_error = None
+
+    async def load(self):
+        try:
+            retriever = await asyncio.to_thread(self.retriever_factory)
+            # build the local normalizer's spell fixer before the first request
+            await asyncio.to_thread(lambda: retriever.normalizer)
+            self.retriever = retriever
+            logger.info("Retriever loaded")
+        except Exception as e:
+            self.load_error = str(e)
+            logger.exception("Retriever failed to load")
+
+    @property
+    def ready(self) -> bool:
+        return self.retriever is not None
+
+    def metrics(self) -> dict:
+        cache = get_llm_cache()
+        return {
+            "normalization_paths": normalization_metrics.stats(),
+            "selection_paths": selection_metrics.stats(),
+            "llm_cache": cache.stats() if cache is not None else None,
+            "selection_cache": self.selection_cache.stats() if self.selection_cache is not None else None,
+            "query_embedding_cache": self._query_cache_stats(),
+            "index": self._index_info(),
+        }
+
+    def _query_cache_stats(self):
+        if self.retriever is None:
+            return None
+        return self.retriever.query_cache.stats()
+
+    def _index_info(self):
+        if self.retriever is None:
+            return None
+        version, revision = self.retriever.index_version
+        return {
+            "collection": self.retriever.collection.name,
+            "version": version,
+            "revision": revision,
+        }
+
+    async def handle(self, method: str, path: str, body: bytes):
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+
+        if method == "GET" and path == "/ready":
+            if self.ready:
+                return HTTPStatus.OK, {"status": "ready"}
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"status": "loading", "error": self.load_error}
+
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, self.metrics()
+
+        if method != "POST" or path not in ("/match", "/retrieve"):
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}
+
+        if not self.ready:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Service is not ready"}
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON body: {e}"}
+        error = _payload_error(payload)
+        if error:
+            return HTTPStatus.BAD_REQUEST, {"error": error}
+
+        top_k = payload.get("top_k", self.top_k)
+        mode = payload.get("normalizer", NORMALIZER_MODE)
+        if mode not in ("llm", "local", "auto"):
+            return HTTPStatus.BAD_REQUEST, {"error": f"Unknown normalizer mode: {mode}"}
+        filters = payload.get("filters")
+        try:
+            normalize_filters(filters)
+        except (ValueError, AttributeError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"Invalid filters: {e}"}
+
+        if path == "/match":
+            text = (payload.get("text") or "").strip()
+            if not text:
+                return HTTPStatus.BAD_REQUEST, {"error": "'text' is required"}
+            results = await match_pipelined(
+                text, self.retriever, self.llm_client, top_k,
+                self.selection_cache, self.fast_path, mode, filters
+            )
+            return HTTPStatus.OK, {"results": results}
+
+        queries = payload.get("queries")
+        if queries is None and payload.get("text"):
+            normalizer = await local_normalizer(self.retriever, mode)
+            queries = await normalize_input_async(payload["text"], self.llm_client, mode, normalizer)
+        if not queries:
+            return HTTPStatus.BAD_REQUEST, {"error": "'queries' or 'text' is required"}
+        batch_data = await asyncio.to_thread(retrieve_candidates, queries, self.retriever, top_k, filters)
+        return HTTPStatus.OK, {"results": batch_data}
+
+
+def _payload_error(payload) -> str:
+    """Why a /match or /retrieve body is malformed, or None."""
+    if not isinstance(payload, dict):
+        return "Request body must be a JSON object"
+    top_k = payload.get("top_k")
+    if top_k is not None and (type(top_k) is not int or not 1 <= top_k <= MAX_TOP_K):
+        return f"'top_k' must be an integer between 1 and {MAX_TOP_K}"
+    if payload.get("text") is not None and not isinstance(payload["text"], str):
+        return "'text' must be a string"
+    queries = payload.get("queries")
+    if queries is not None and not (isinstance(queries, list) and all(isinstance(q, str) for q in queries)):
+        return "'queries' must be a list of strings"
+    return None
+
+
+async def serve(service: MatchService, host: str = HOST, port: int = PORT):
+    server = await start_json_server(service.handle, host, port)
+    # load in the background so /health answers while the models load
+    asyncio.create_task(service.load())
+    print(f"Serving on http://{host}:{port}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await close_async_llm()
+
+
+def run(host: str = HOST, port: int = PORT, llm_backend: str = None):
+    service = MatchService(
+        get_async_llm(llm_backend),
+        lambda: HybridRetriever(debug=False),
+        selection_cache=get_selection_cache(),
+        fast_path=get_fast_path(),
+    )
+    asyncio.run(serve(service, host, port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product catalog matching service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--llm", default=None, help="LLM backend: groq (default) or stub")
+    args = parser.parse_args()
+
+    run(args.host, args.port, args.llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules are flat files in product_catalog_rag/, imported as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,108 @@
+import random
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from bm25_index import BM25Index, tokenize
+
+VOCAB = [f"w{i}" for i in range(300)]
+
+
+def _corpus(rng, n_docs):
+    # Zipf-like term frequencies, so common and rare terms both occur
+    weights = [1 / (i + 1) for i in range(len(VOCAB))]
+    return [" ".join(rng.choices(VOCAB, weights, k=rng.randint(3, 40))) for _ in range(n_docs)]
+
+
+def _queries(rng, n):
+    return [rng.sample(VOCAB + ["unknown"], rng.randint(1, 5)) for _ in range(n)]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(7)
+    docs = _corpus(rng, 500)
+    ids = [f"P{i}" for i in range(len(docs))]
+    return ids, docs, _queries(rng, 300)
+
+
+def _by_id(index, scores):
+    return dict(zip(index.doc_ids.tolist(), scores.tolist()))
+
+
+def test_scores_match_rank_bm25(corpus):
+    ids, docs, queries = corpus
+    index = BM25Index.build(ids, docs)
+    reference = BM25Okapi([tokenize(d) for d in docs])
+
+    for tokens in queries:
+        np.testing.assert_allclose(index.get_scores(tokens), reference.get_scores(tokens), rtol=1e-9, atol=1e-12)
+
+
+def test_top_k_matches_rank_bm25(corpus):
+    ids, docs, queries = corpus
+    index = BM25Index.build(ids, docs)
+    reference = BM25Okapi([tokenize(d) for d in docs])
+
+    for tokens in queries:
+        expected = np.sort(reference.get_scores(tokens))[::-1][:10]
+        expected = expected[expected > 0]
+        hits = index.top_k(tokens, 10)
+        np.testing.assert_allclose([score for _, score in hits], expected, rtol=1e-9)
+        for pos, score in hits:
+            assert reference.get_scores(tokens)[pos] == pytest.approx(score)
+
+
+def test_top_k_batch_matches_top_k(corpus):
+    ids, docs, queries = corpus
+    index = BM25Index.build(ids, docs)
+    assert index.top_k_batch(queries, 10) == [index.top_k(tokens, 10) for tokens in queries]
+
+
+def test_upsert_and_delete_match_a_fresh_build(corpus):
+    ids, docs, queries = corpus
+    rng = random.Random(11)
+    changed = {doc_id: doc for doc_id, doc in zip(ids[:50], _corpus(rng, 50))}
+    added = {f"N{i}": doc for i, doc in enumerate(_corpus(rng, 20))}
+    removed = ids[50:80]
+
+    updated = BM25Index.build(ids, docs).delete(removed).upsert(
+        list(changed) + list(added), list(changed.values()) + list(added.values())
+    )
+
+    final = dict(zip(ids, docs))
+    final.update(changed)
+    final.update(added)
+    for doc_id in removed:
+        del final[doc_id]
+    fresh = BM25Index.build(list(final), list(final.values()))
+
+    assert sorted(updated.doc_ids.tolist()) == sorted(final)
+    assert (updated.positions(removed) == -1).all()
+    for tokens in queries[:50]:
+        got, want = _by_id(updated, updated.get_scores(tokens)), _by_id(fresh, fresh.get_scores(tokens))
+        assert got.keys() == want.keys()
+        np.testing.assert_allclose([got[k] for k in want], list(want.values()), rtol=1e-9, atol=1e-12)
+
+
+def test_save_load_round_trip(corpus, tmp_path):
+    ids, docs, queries = corpus
+    index = BM25Index.build(ids, docs)
+    path = str(tmp_path / "bm25_index__v1")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert loaded.doc_ids.tolist() == ids
+    for tokens in queries[:20]:
+        assert loaded.top_k(tokens, 10) == index.top_k(tokens, 10)
+
+
+def test_save_never_replaces_a_published_directory(corpus, tmp_path):
+    ids, docs, _ = corpus
+    path = str(tmp_path / "bm25_index__v1")
+    BM25Index.build(ids, docs).save(path)
+
+    with pytest.raises(FileExistsError):
+        BM25Index.build(ids[:10], docs[:10]).save(path)
+    assert BM25Index.load(path).num_docs == len(ids)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+import bulk
+from llm_client import AsyncLLMClient, StubBackend
+
+
+class FakeRetriever:
+    """Three candidates per query; counts the queries it retrieved."""
+
+    normalizer = None
+
+    def __init__(self):
+        self.queries = []
+
+    def hybrid_retrieve_batch(self, queries, top_k, filters=None):
+        self.queries.extend(queries)
+        return [
+            [{
+                "product_id": f"{query}-{i}", "product_name": query, "category": "c", "distance": 0.1,
+                "hybrid_score": 0.5 - 0.01 * i, "numeric_match": 0, "exact_identifier": False,
+                "doc": "Description: x",
+            } for i in range(3)]
+            for query in queries
+        ]
+
+
+def _write_orders(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": f"o{i}", "text": f"widget {i}, cable {i}"}) + "\n")
+
+
+def _match(input_file, output_file, retriever, **options):
+    async def main():
+        return await bulk.match_file(
+            input_file, output_file, retriever, AsyncLLMClient(StubBackend()), normalizer_mode="llm", **options
+        )
+    return asyncio.run(main())
+
+
+def _output_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+@pytest.fixture
+def orders(tmp_path):
+    input_file = tmp_path / "orders.jsonl"
+    _write_orders(input_file, 10)
+    return str(input_file), str(tmp_path / "orders.matched.jsonl")
+
+
+def test_completed_ids_truncates_a_torn_last_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    # the last line parses but has no newline: the write was cut short
+    path.write_text('{"id": "a", "results": []}\n{"id": "b", "results": []}\n{"id": "c", "results": []}')
+    assert bulk.completed_ids(str(path)) == {"a", "b"}
+    assert path.read_text() == '{"id": "a", "results": []}\n{"id": "b", "results": []}\n'
+
+    path.write_text('{"id": "a", "results": []}\n{"id": "b", "res')
+    assert bulk.completed_ids(str(path)) == {"a"}
+    assert bulk.completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_every_order_is_matched_once(orders):
+    input_file, output_file = orders
+    stats = _match(input_file, output_file, FakeRetriever(), workers=3)
+
+    assert stats["matched"] == 10 and stats["failed"] == 0
+    assert sorted(_output_ids(output_file)) == [f"o{i}" for i in range(10)]
+    with open(output_file, encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert [r["input_query"] for r in record["results"]] == [f"widget {record['id'][1:]}", f"cable {record['id'][1:]}"]
+
+
+def test_resume_only_matches_unfinished_orders(orders):
+    input_file, output_file = orders
+    _match(input_file, output_file, FakeRetriever())
+
+    # crash: the last three records never made it, the one before was torn
+    with open(output_file, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.writelines(lines[:6])
+        f.write(lines[6][:15])
+
+    retriever = FakeRetriever()
+    stats = _match(input_file, output_file, retriever)
+
+    assert stats["skipped"] == 6 and stats["matched"] == 4
+    assert len(retriever.queries) == 8  # two queries per re-matched order
+    ids = _output_ids(output_file)
+    assert sorted(ids) == [f"o{i}" for i in range(10)] and len(ids) == len(set(ids))
+
+
+def test_restart_rematches_everything(orders):
+    input_file, output_file = orders
+    _match(input_file, output_file, FakeRetriever())
+
+    stats = _match(input_file, output_file, FakeRetriever(), resume=False)
+    assert stats["matched"] == 10 and stats["skipped"] == 0
+    assert len(_output_ids(output_file)) == 10
+
+
+def test_zero_workers_still_finishes(orders):
+    input_file, output_file = orders
+    stats = _match(input_file, output_file, FakeRetriever(), workers=0)
+    assert stats["matched"] == 10
@@ -0,0 +1,73 @@
+import pytest
+
+from identifier_index import (
+    EXACT_WEIGHT, FUZZY_WEIGHT, NUMBER_WEIGHT, PART_WEIGHT, PREFIX_WEIGHT, IdentifierIndex, extract_identifiers,
+    load_or_build,
+)
+
+PRODUCTS = [
+    ("a", "P-100", "Intel Core i7-13700K"),
+    ("b", "P-200", "Corsair GX-850 PSU"),
+    ("c", "P-300", "Seasonic Focus 850 W"),
+    ("d", "P-400", "Intel Core i7-13700"),
+    ("e", "P-500", "RTX4080 Super"),
+]
+IDS = [doc_id for doc_id, _, _ in PRODUCTS]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return IdentifierIndex.build(PRODUCTS)
+
+
+def _scores(index, query):
+    return dict(zip(IDS, index.scores(index.match(query), IDS).tolist()))
+
+
+def test_extract_identifiers():
+    assert extract_identifiers("Corsair GX-850") == {"gx850", "~850"}
+    assert extract_identifiers("i7-13700K") == {"i713700k", "~i7", "~13700k", "~13700"}
+    # a bare number is never a full code
+    assert extract_identifiers("850 W") == {"~850"}
+
+
+def test_full_code_is_exact_regardless_of_separators(index):
+    for query in ("GX850", "gx-850", "GX/850", "GX.850"):
+        assert _scores(index, query)["b"] == EXACT_WEIGHT
+
+
+def test_shared_part_is_not_exact(index):
+    scores = _scores(index, "i7-13700")
+    assert scores["d"] == EXACT_WEIGHT
+    assert scores["a"] == PART_WEIGHT  # i7-13700K only shares parts
+
+    scores = _scores(index, "i7-13700K")
+    assert scores["a"] == EXACT_WEIGHT
+    assert scores["d"] == PART_WEIGHT
+
+
+def test_shared_number_is_a_weak_hit(index):
+    scores = _scores(index, "850 watt")
+    assert scores["b"] == scores["c"] == NUMBER_WEIGHT
+    assert scores["a"] == scores["d"] == scores["e"] == 0
+
+
+def test_prefix_and_fuzzy_hits_are_not_exact(index):
+    assert _scores(index, "RTX408")["e"] == PREFIX_WEIGHT
+    assert _scores(index, "RTX4O80")["e"] == FUZZY_WEIGHT
+
+
+def test_recall_prefers_stronger_hits(index):
+    assert index.recall(index.match("i7-13700K"), 2) == [("a", EXACT_WEIGHT), ("d", PART_WEIGHT)]
+
+
+def test_unknown_ids_score_zero(index):
+    assert index.scores(index.match("GX850"), ["b", "missing"]).tolist() == [EXACT_WEIGHT, 0.0]
+
+
+def test_save_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "ident_index__v1")
+    index.save(path)
+    loaded = load_or_build(None, path)  # present and current: no collection needed
+    for query in ("i7-13700", "GX850", "850", "RTX408"):
+        assert _scores(loaded, query) == _scores(index, query)
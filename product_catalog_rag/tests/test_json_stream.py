@@ -0,0 +1,60 @@
+import json
+
+from json_stream import JSONArrayParser
+
+RECORDS = [
+    {"input_query": "gx 850 psu", "selected_product_id": "P1", "reason": "has a } and ] in \"quotes\""},
+    {"input_query": "cpu", "selected_product_id": None, "tags": [1, [2, 3]]},
+    {"input_query": "ram", "selected_product_id": "P3"},
+]
+
+
+def _parse(text, chunk_size=None):
+    parser = JSONArrayParser()
+    chunks = [text] if chunk_size is None else [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    elements = [element for chunk in chunks for element in parser.feed(chunk)]
+    return elements + parser.close()
+
+
+def test_whole_array():
+    assert _parse(json.dumps(RECORDS)) == [(True, r) for r in RECORDS]
+
+
+def test_any_chunking_gives_the_same_elements():
+    text = json.dumps(RECORDS, indent=2)
+    for size in (1, 2, 3, 7, 64):
+        assert _parse(text, size) == [(True, r) for r in RECORDS]
+
+
+def test_objects_are_emitted_at_their_closing_brace():
+    parser = JSONArrayParser()
+    assert parser.feed('[{"a": 1}') == [(True, {"a": 1})]
+    assert parser.feed(', {"b": 2') == []
+    assert parser.feed("}]") == [(True, {"b": 2})]
+
+
+def test_code_fence_and_prose_are_skipped():
+    text = "Here you go:\n```json\n" + json.dumps(RECORDS) + "\n```\nDone."
+    assert _parse(text, 5) == [(True, r) for r in RECORDS]
+
+
+def test_text_after_the_array_is_ignored():
+    assert _parse('[1, "two"] trailing [3]') == [(True, 1), (True, "two")]
+
+
+def test_truncated_last_element():
+    text = json.dumps(RECORDS)[:-20]
+    elements = _parse(text, 4)
+    assert elements[:2] == [(True, r) for r in RECORDS[:2]]
+    ok, raw = elements[2]
+    assert not ok and raw.startswith('{"input_query": "ram"')
+
+
+def test_malformed_element_does_not_spoil_the_rest():
+    text = '[{"a": 1}, {"b": 2,}, {"c": 3}]'
+    assert _parse(text, 3) == [(True, {"a": 1}), (False, '{"b": 2,}'), (True, {"c": 3})]
+
+
+def test_no_array():
+    assert _parse("Sorry, I cannot help with that.") == []
+    assert _parse("[]") == []
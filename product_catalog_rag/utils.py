@@ -1,26 +1,69 @@
-import httpx
 import os
-import asyncio
+import logging
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-import re
+
+from llm_cache import cache_key, get_llm_cache
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 api_key = os.getenv("GROQ_API_KEY")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
 
 #function to call LLM
 
-def call_llm(prompt:str) -> str:
-    llm = ChatGroq(
-        model="openai/gpt-oss-120b",
-        temperature=0,
-        max_tokens=1000,
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-oss-120b")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1000"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+@lru_cache(maxsize=1)
+def _chat_groq():
+    # langchain is slow to import; only pay for it when the LLM is called
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        timeout=LLM_TIMEOUT,
         api_key=api_key
     )
 
-    response = llm.invoke([prompt])
-    print("LLM response object:", response)
-    return response.content 
+def call_llm(prompt:str, validate=None) -> str:
+    """
+    Blocking LLM call behind the response cache. When `validate` is given,
+    only responses it accepts are cached or served from the cache.
+    """
+    cache = get_llm_cache()
+    key = cache_key(prompt, LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None and (validate is None or validate(cached)):
+            return cached
+
+    response = _chat_groq().invoke([prompt])
+    logger.debug("LLM response metadata: %s", response.response_metadata)
+
+    if cache is not None and (validate is None or validate(response.content)):
+        cache.put(key, response.content)
+    return response.content
+
+def get_llm(backend: str = None):
+    """
+    Return the prompt -> text callable for `backend` ("groq" or "stub"),
+    called as llm(prompt, validate=None) (see call_llm). The stub answers
+    locally so the pipeline can run offline.
+    """
+    backend = backend or LLM_BACKEND
+    if backend == "groq":
+        return call_llm
+    if backend == "stub":
+        from llm_stub import stub_llm
+        return stub_llm
+    raise ValueError(f"Unknown LLM backend: {backend}")
 
 def pretty_print_batch_data(batch_data: list[dict]) -> None:
     print("\n================ VECTOR SEARCH RESULTS ================\n")
@@ -44,105 +87,3 @@ def pretty_print_batch_data(batch_data: list[dict]) -> None:
         print("=" * 60)
 
     print("\n=======================================================\n")
-
-def tokenize(text: str):
-    return re.findall(r"\b\w+\b", text.lower())
-
-def hybrid_retrieve(query, collection, bm25, documents, metadatas, ids, top_k=10):
-    # ---------------------------
-    # VECTOR SEARCH (Recall)
-    # ---------------------------
-    vector_results = collection.query(
-        query_texts=[query],
-        n_results=25,  # high recall
-        include=["documents", "metadatas", "distances"]
-    )
-
-    vector_candidates = {}
-    for doc, meta, dist in zip(
-        vector_results["documents"][0],
-        vector_results["metadatas"][0],
-        vector_results["distances"][0]
-    ):
-        pid = meta["product_id"]
-        vector_candidates[pid] = {
-            "product_id": pid,
-            "product_name": meta["product_name"],
-            "category": meta["category"],
-            "distance": dist,
-            "doc": doc,
-            "bm25": 0.0,
-            "numeric_match": 0
-        }
-
-    # ---------------------------
-    # KEYWORD SEARCH (BM25)
-    # ---------------------------
-    tokens = tokenize(query)
-    bm25_scores = bm25.get_scores(tokens)
-
-    for idx, score in enumerate(bm25_scores):
-        if score <= 0:
-            continue
-
-        pid = metadatas[idx]["product_id"]
-
-        if pid not in vector_candidates:
-            vector_candidates[pid] = {
-                "product_id": pid,
-                "product_name": metadatas[idx]["product_name"],
-                "category": metadatas[idx]["category"],
-                "distance": 1.0,  # worst distance
-                "doc": documents[idx],
-                "bm25": score,
-                "numeric_match": 0
-            }
-        else:
-            vector_candidates[pid]["bm25"] = score
-
-    # ---------------------------
-    # NUMERIC MATCH BOOST
-    # ---------------------------
-    numbers_in_query = set(re.findall(r"\d+", query))
-
-    for c in vector_candidates.values():
-        numbers_in_name = set(re.findall(r"\d+", c["product_name"]))
-        if numbers_in_query & numbers_in_name:
-            c["numeric_match"] = 1
-
-    # ---------------------------
-    # NORMALIZATION
-    # ---------------------------
-    distances = [1 - c["distance"] for c in vector_candidates.values()]
-    bm25s = [c["bm25"] for c in vector_candidates.values()]
-
-    def normalize(xs):
-        if not xs or max(xs) == min(xs):
-            return xs
-        return [(x - min(xs)) / (max(xs) - min(xs)) for x in xs]
-
-    norm_vec = normalize(distances)
-    norm_bm25 = normalize(bm25s)
-
-    # ---------------------------
-    # FINAL HYBRID SCORE
-    # ---------------------------
-    ALPHA = 0.5   # semantic
-    BETA = 0.3    # keyword
-    GAMMA = 0.2   # numeric identity
-
-    for c, v, b in zip(vector_candidates.values(), norm_vec, norm_bm25):
-        c["hybrid_score"] = (
-            ALPHA * v +
-            BETA * b +
-            GAMMA * c["numeric_match"]
-        )
-
-    # ---------------------------
-    # SORT & RETURN
-    # ---------------------------
-    return sorted(
-        vector_candidates.values(),
-        key=lambda x: x["hybrid_score"],
-        reverse=True
-    )[:top_k]